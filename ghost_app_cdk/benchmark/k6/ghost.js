@@ -0,0 +1,32 @@
+// Admin API helpers shared by the seed and the scenario scripts
+import http from 'k6/http';
+
+export const BASE_URL = __ENV.BASE_URL || 'http://ghost:2368';
+export const content = JSON.parse(open('/fixtures/content.json'));
+
+const ADMIN_HEADERS = {
+    'Accept-Version': 'v5.0',
+    'Origin': BASE_URL
+};
+
+export function adminHeaders(session, extra) {
+    return Object.assign({ Cookie: session }, ADMIN_HEADERS, extra || {});
+}
+
+export function check2xx(response, what) {
+    if (response.status < 200 || response.status >= 300) {
+        throw new Error(`${what} failed with ${response.status}: ${response.body}`);
+    }
+    return response;
+}
+
+// Staff session cookie, device verification is switched off in docker-compose.yml
+export function login() {
+    const response = check2xx(http.post(
+        `${BASE_URL}/ghost/api/admin/session/`,
+        JSON.stringify({ username: content.owner.email, password: content.owner.password }),
+        { headers: Object.assign({ 'Content-Type': 'application/json' }, ADMIN_HEADERS), redirects: 0 }
+    ), 'Login');
+    const cookie = response.cookies['ghost-admin-api-session'][0];
+    return `ghost-admin-api-session=${cookie.value}`;
+}
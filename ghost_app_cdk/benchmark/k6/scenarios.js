@@ -0,0 +1,90 @@
+// Closed loop scenarios run one after the other, so each one measures the container on its own
+import http from 'k6/http';
+import { check } from 'k6';
+import { BASE_URL, adminHeaders, check2xx, login } from './ghost.js';
+
+const VUS = parseInt(__ENV.VUS || '10');
+const DURATION = parseInt(__ENV.DURATION || '60');
+const PAUSE = 5;
+
+const SCENARIOS = ['home', 'post', 'tag', 'image', 'admin_api'];
+
+const scenarios = {};
+const thresholds = {};
+SCENARIOS.forEach((name, index) => {
+    scenarios[name] = {
+        executor: 'constant-vus',
+        exec: name,
+        vus: VUS,
+        duration: `${DURATION}s`,
+        startTime: `${index * (DURATION + PAUSE)}s`,
+        gracefulStop: '5s'
+    };
+    // Thresholds that always pass, they make k6 report the metrics of every scenario in the summary
+    thresholds[`http_req_duration{scenario:${name}}`] = ['max>=0'];
+    thresholds[`http_reqs{scenario:${name}}`] = ['count>=0'];
+    thresholds[`http_req_failed{scenario:${name}}`] = ['rate>=0'];
+});
+
+export const options = {
+    scenarios: scenarios,
+    thresholds: thresholds,
+    summaryTrendStats: ['avg', 'min', 'med', 'max', 'p(50)', 'p(95)', 'p(99)'],
+    discardResponseBodies: true
+};
+
+export function setup() {
+    const session = login();
+    const posts = check2xx(http.get(
+        `${BASE_URL}/ghost/api/admin/posts/?limit=all&fields=slug,feature_image&include=tags`,
+        { headers: adminHeaders(session), responseType: 'text' }
+    ), 'Post list').json('posts');
+
+    const tags = [];
+    posts.forEach((post) => post.tags.forEach((tag) => {
+        if (!tags.includes(tag.slug)) {
+            tags.push(tag.slug);
+        }
+    }));
+
+    // Resized variants are what themes request, Ghost creates them on the first request
+    const images = posts.filter((post) => post.feature_image).map((post) =>
+        post.feature_image.replace('/content/images/', '/content/images/size/w600/'));
+
+    return { session: session, posts: posts.map((post) => post.slug), tags: tags, images: images };
+}
+
+function pick(items) {
+    return items[Math.floor(Math.random() * items.length)];
+}
+
+function get(url, params) {
+    const response = http.get(url, params);
+    check(response, { 'status is 200': (r) => r.status === 200 });
+}
+
+export function home() {
+    get(`${BASE_URL}/`);
+}
+
+export function post(data) {
+    get(`${BASE_URL}/${pick(data.posts)}/`);
+}
+
+export function tag(data) {
+    get(`${BASE_URL}/tag/${pick(data.tags)}/`);
+}
+
+export function image(data) {
+    get(pick(data.images));
+}
+
+export function admin_api(data) {
+    get(`${BASE_URL}/ghost/api/admin/posts/?limit=15&include=tags,authors&formats=html`, { headers: adminHeaders(data.session) });
+}
+
+export function handleSummary(data) {
+    return {
+        '/results/k6-summary.json': JSON.stringify(data, null, 2)
+    };
+}
@@ -0,0 +1,76 @@
+// Loads the fixture of fixtures/content.json into an empty Ghost, run once before the scenarios
+import http from 'k6/http';
+import { BASE_URL, content, adminHeaders, check2xx, login } from './ghost.js';
+
+export const options = {
+    vus: 1,
+    iterations: 1
+};
+
+const images = [];
+for (let index = 0; index < content.images; index++) {
+    images.push(open(`/fixtures/images/image-${index}.png`, 'b'));
+}
+
+function paragraphs(post) {
+    const lines = [];
+    for (let index = 0; index < content.paragraphs_per_post; index++) {
+        lines.push(`<p>Paragraph ${index} of benchmark post ${post}. ` +
+            'Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore ' +
+            'et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris nisi ut ' +
+            'aliquip ex ea commodo consequat.</p>');
+    }
+    return lines.join('\n');
+}
+
+export default function () {
+    const setup = check2xx(http.get(`${BASE_URL}/ghost/api/admin/authentication/setup/`), 'Setup status');
+    if (setup.json('setup.0.status')) {
+        console.log('Ghost is already set up, skipping the seed');
+        return;
+    }
+
+    check2xx(http.post(
+        `${BASE_URL}/ghost/api/admin/authentication/setup/`,
+        JSON.stringify({
+            setup: [{
+                name: content.owner.name,
+                email: content.owner.email,
+                password: content.owner.password,
+                blogTitle: content.blog_title
+            }]
+        }),
+        { headers: adminHeaders('', { 'Content-Type': 'application/json' }) }
+    ), 'Setup');
+
+    const session = login();
+
+    const imageUrls = images.map((image, index) => check2xx(http.post(
+        `${BASE_URL}/ghost/api/admin/images/upload/`,
+        { file: http.file(image, `image-${index}.png`, 'image/png'), ref: `image-${index}.png` },
+        { headers: adminHeaders(session) }
+    ), 'Image upload').json('images.0.url'));
+
+    for (let post = 0; post < content.posts; post++) {
+        const tags = [];
+        for (let index = 0; index < content.tags_per_post; index++) {
+            tags.push({ name: content.tags[(post + index) % content.tags.length] });
+        }
+        check2xx(http.post(
+            `${BASE_URL}/ghost/api/admin/posts/?source=html`,
+            JSON.stringify({
+                posts: [{
+                    title: `Benchmark post ${post}`,
+                    slug: `benchmark-post-${post}`,
+                    html: paragraphs(post),
+                    status: 'published',
+                    feature_image: imageUrls[post % imageUrls.length],
+                    tags: tags
+                }]
+            }),
+            { headers: adminHeaders(session, { 'Content-Type': 'application/json' }) }
+        ), 'Post creation');
+    }
+
+    console.log(`Seeded ${content.posts} posts, ${content.tags.length} tags and ${imageUrls.length} images`);
+}
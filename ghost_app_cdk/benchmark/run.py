@@ -0,0 +1,233 @@
+"""Benchmark of the my-ghost-app container, see the Benchmark section of the README.
+
+Starts Ghost and MySQL with docker compose, seeds the fixture, runs the k6 scenarios and compares
+throughput, latency and container CPU/RSS with the committed baseline.
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import struct
+import subprocess
+import sys
+import threading
+import time
+import zlib
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+IMAGES_DIR = os.path.join(BENCHMARK_DIR, "fixtures", "images")
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, "baseline.json")
+THRESHOLDS_FILE = os.path.join(BENCHMARK_DIR, "thresholds.json")
+
+SCENARIOS = ["home", "post", "tag", "image", "admin_api"]
+
+# Metrics where a higher value is better, every other metric regresses when it grows
+HIGHER_IS_BETTER = ["throughput"]
+
+MEMORY_UNITS = {"B": 1 / 2**20, "KiB": 1 / 2**10, "MiB": 1, "GiB": 2**10}
+
+
+def compose(*args, capture=False):
+    return subprocess.run(
+        ["docker", "compose", *args],
+        cwd=BENCHMARK_DIR,
+        check=True,
+        text=True,
+        stdout=subprocess.PIPE if capture else None
+    ).stdout
+
+
+def write_png(path, width, height, seed):
+    # Deterministic gradients, large enough for Ghost to create resized variants
+    rows = bytearray()
+    for y in range(height):
+        rows.append(0)
+        for x in range(width):
+            rows += bytes(((x + seed * 37) % 256, (y + seed * 59) % 256, (x + y) % 256))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    with open(path, "wb") as png:
+        png.write(b"\x89PNG\r\n\x1a\n")
+        png.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        png.write(chunk(b"IDAT", zlib.compress(rows, 9)))
+        png.write(chunk(b"IEND", b""))
+
+
+def generate_images(count):
+    os.makedirs(IMAGES_DIR, exist_ok=True)
+    for index in range(count):
+        path = os.path.join(IMAGES_DIR, f"image-{index}.png")
+        if not os.path.exists(path):
+            write_png(path, 1200, 800, index)
+
+
+class StatsSampler(threading.Thread):
+    """Samples CPU and memory of the Ghost container with docker stats while the scenarios run."""
+
+    def __init__(self, container_id):
+        super().__init__(daemon=True)
+        self.container_id = container_id
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            output = subprocess.run(
+                ["docker", "stats", "--no-stream", "--format", "{{json .}}", self.container_id],
+                text=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            ).stdout.strip()
+            if output:
+                stats = json.loads(output)
+                memory = re.match(r"([\d.]+)(\w+)", stats["MemUsage"].split("/")[0].strip())
+                self.samples.append({
+                    "cpu": float(stats["CPUPerc"].rstrip("%")),
+                    "rss_mib": float(memory.group(1)) * MEMORY_UNITS.get(memory.group(2), 1)
+                })
+
+    def summary(self):
+        cpu = [sample["cpu"] for sample in self.samples] or [0]
+        rss = [sample["rss_mib"] for sample in self.samples] or [0]
+        return {
+            "cpu_avg": round(sum(cpu) / len(cpu), 1),
+            "cpu_max": round(max(cpu), 1),
+            "rss_max_mib": round(max(rss), 1)
+        }
+
+
+def scenario_results(summary, duration):
+    metrics = summary["metrics"]
+    results = {}
+    for scenario in SCENARIOS:
+        durations = metrics[f"http_req_duration{{scenario:{scenario}}}"]["values"]
+        requests = metrics[f"http_reqs{{scenario:{scenario}}}"]["values"]
+        failed = metrics[f"http_req_failed{{scenario:{scenario}}}"]["values"]
+        results[scenario] = {
+            "throughput": round(requests["count"] / duration, 1),
+            "latency_p50": round(durations["p(50)"], 1),
+            "latency_p95": round(durations["p(95)"], 1),
+            "latency_p99": round(durations["p(99)"], 1),
+            "error_rate": round(failed["rate"], 4)
+        }
+    return results
+
+
+def compare(result, baseline, thresholds):
+    """Returns the regressions of result against baseline, thresholds are allowed changes in percent
+    except max_error_rate, the highest share of failed requests of a scenario."""
+    regressions = [
+        f"{scenario} error_rate: {values['error_rate']}"
+        for scenario, values in result["scenarios"].items()
+        if values["error_rate"] > thresholds["max_error_rate"]
+    ]
+    if not baseline:
+        print("No baseline recorded yet, run with --update-baseline to record one")
+        return regressions
+
+    current = dict(result["scenarios"], container=result["container"])
+    reference = dict(baseline["scenarios"], container=baseline["container"])
+
+    print(f"{'':<24}{'baseline':>12}{'current':>12}{'change':>10}")
+    for group, metrics in reference.items():
+        for metric, base_value in metrics.items():
+            if metric not in thresholds or not base_value:
+                continue
+            value = current[group][metric]
+            change = 100 * (value - base_value) / base_value
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = ""
+            if worse > thresholds[metric]:
+                flag = "  REGRESSION"
+                regressions.append(f"{group} {metric}: {base_value} -> {value} ({change:+.1f}%)")
+            print(f"{group + ' ' + metric:<24}{base_value:>12}{value:>12}{change:>+9.1f}%{flag}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--build", action="store_true", help="Build the image first, needs network access")
+    parser.add_argument("--vus", type=int, default=10, help="Concurrent virtual users of every scenario")
+    parser.add_argument("--duration", type=int, default=60, help="Seconds every scenario runs")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the result as the new baseline")
+    parser.add_argument("--keep", action="store_true", help="Leave the containers running afterwards")
+    args = parser.parse_args()
+
+    with open(os.path.join(BENCHMARK_DIR, "fixtures", "content.json")) as content_file:
+        generate_images(json.load(content_file)["images"])
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+
+    if args.build:
+        compose("build", "ghost")
+
+    try:
+        compose("up", "--detach", "--wait", "--no-build", "--pull", "never", "mysql", "ghost")
+        compose("run", "--rm", "k6", "run", "--quiet", "/scripts/seed.js")
+
+        container_id = compose("ps", "--quiet", "ghost", capture=True).strip()
+        sampler = StatsSampler(container_id)
+        sampler.start()
+        compose(
+            "run", "--rm",
+            "--env", f"VUS={args.vus}",
+            "--env", f"DURATION={args.duration}",
+            "k6", "run", "/scripts/scenarios.js"
+        )
+        sampler.stopped.set()
+        sampler.join()
+    finally:
+        if not args.keep:
+            compose("down", "--volumes")
+
+    with open(os.path.join(RESULTS_DIR, "k6-summary.json")) as summary_file:
+        summary = json.load(summary_file)
+
+    result = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "settings": {
+            "vus": args.vus,
+            "duration": args.duration,
+            "ghost_cpus": os.environ.get("GHOST_CPUS", "0.5"),
+            "ghost_memory": os.environ.get("GHOST_MEMORY", "1g")
+        },
+        "scenarios": scenario_results(summary, args.duration),
+        "container": sampler.summary()
+    }
+
+    result_file = os.path.join(RESULTS_DIR, f"result-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(result_file, "w") as output:
+        json.dump(result, output, indent=2)
+    print(f"Result written to {result_file}")
+
+    with open(BASELINE_FILE) as baseline_file:
+        baseline = json.load(baseline_file)
+    with open(THRESHOLDS_FILE) as thresholds_file:
+        thresholds = json.load(thresholds_file)
+
+    if baseline and baseline.get("settings") and baseline["settings"] != result["settings"]:
+        print(f"Warning: the baseline was recorded with {baseline['settings']}")
+
+    regressions = compare(result, baseline, thresholds)
+
+    if args.update_baseline:
+        with open(BASELINE_FILE, "w") as output:
+            json.dump(result, output, indent=2)
+            output.write("\n")
+        print(f"Baseline updated from {result_file}")
+        return 0
+
+    if regressions:
+        print("Regressions against the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
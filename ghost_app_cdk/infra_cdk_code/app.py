@@ -1,12 +1,22 @@
 #!/usr/bin/env python3
+import copy
+import os
+
 from ruamel.yaml import YAML
 from aws_cdk import (
-    App, Tags
+    App, Aspects, Stack, Tags
 )
 
-from infra_cdk_code.infra_cdk_code_stack import InfraCdkCodeStack
+from infra_cdk_code.infra_cdk_code_stack import CdkCodeStack
 from infra_cdk_code.fe_build_deploy import FeBuildDeploy
 from infra_cdk_code.event_rules_service_account_stack import EventRulesServiceAccountStack
+from infra_cdk_code.config_model import parse_config
+from infra_cdk_code.performance_policy import PerformancePolicy
+
+# Stacks built for every app and account, select some of them with -c stacks=infra,pipeline
+STACK_KINDS = ["infra", "pipeline", "events"]
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
 
 def load_config() -> dict:
     """
@@ -21,56 +31,122 @@ def load_config() -> dict:
     return config
 
 
-def init_app() -> App:
+def regional_config(config: dict, region: dict) -> dict:
+    """
+    Copy the config of an account for one of its additional regions
+    :return: dict with the region specific items replaced
+    """
+    configr = copy.deepcopy(config)
+    configr['acc']['region'] = region['region']
+    configr['acc']['resources']['vpcId'] = region['vpcId']
+    configr['acc']['availability_zones'] = region.get('availability_zones') or config['acc'].get('availability_zones')
+    configr['fe']['lb']['certificate_arn'] = region['certificate_arn']
+    # The services of the additional regions are new, the pipeline addresses them by the name of the app
+    configr['fe']['ecs']['service_name'] = config['fe']['code']['name']
+    # A single distribution in the main region fronts the app
+    configr['fe'].pop('cdn', None)
+    # Blue/green runs in the main region, the additional regions follow with rolling updates
+    configr['fe']['ecs']['deployment'].pop('blue_green', None)
+    return configr
+
+
+def context_filter(main_app: App, key: str) -> list:
     """
-    Initiates CDK main_app for deployment
+    Read a stack filter from the CDK context (cdk synth -c stacks=infra,pipeline) or the environment (STACKS=infra)
+    :return: list of the comma separated values, empty when the filter is not set
+    """
+    value = main_app.node.try_get_context(key) or os.environ.get(key.upper()) or ""
+    return [item.strip() for item in f"{value}".split(",") if item.strip()]
+
+
+def tag_stack(stack: Stack, tags: dict) -> None:
+    """
+    Apply the stack_tags of the account to one stack
+    """
+    for key, value in tags.items():
+        Tags.of(stack).add(key=key, value=value)
+
+
+def init_app(main_app: App = None, config: dict = None) -> App:
+    """
+    Initiates CDK main_app for deployment, only the stacks selected by the account, app and stacks filters are built
     :return: main_app
     """
-    main_app = App()
-    config = load_config()
-    configd = {}
-
-    # Deploy the same stack for all apps in the config-app.yaml
-    for key, value in config['aws_vars'].items():
-        configd['acc']=value
-        for key, value in config['frontend-ghost-app'].items():
-            configd['fe']=value
-
-            deploy1 = InfraCdkCodeStack(
-                        main_app,
-                        f"cdk-fe-ghost-app-infra-pipeline-{configd['acc']['project']['shortName']}-{configd['acc']['accountId']}",
-                        env={
-                                'account': configd['acc']['accountId'],
-                                'region': configd['acc']['region']
-                            },
-                        config=configd
-                    )
-            for key, value in configd['acc']['stack_tags'].items():
-                Tags.of(main_app).add(key=key, value=value)
-            
-            deploy2 = FeBuildDeploy(
-                        main_app,
-                        f"cdk-ghost-app-deployment-pipeline-{configd['acc']['project']['shortName']}-{configd['acc']['accountId']}",
-                        env={
-                                'account': configd['acc']['accountId'],
-                                'region': configd['acc']['region']
-                            },
-                        config=configd
-                    )
-            for key, value in configd['acc']['stack_tags'].items():
-                Tags.of(main_app).add(key=key, value=value)
-            
-            deploy3 = EventRulesServiceAccountStack(
+    main_app = main_app or App()
+    config = config or load_config()
+    deployments = parse_config(config)
+
+    accounts = context_filter(main_app, "account")
+    apps = context_filter(main_app, "app")
+    stacks = context_filter(main_app, "stacks") or STACK_KINDS
+    unknown_stacks = set(stacks) - set(STACK_KINDS)
+    if unknown_stacks:
+        raise RuntimeError(f"Unknown stacks {', '.join(sorted(unknown_stacks))}, choose from {', '.join(STACK_KINDS)}")
+
+    # Deploy the same stacks for all apps in every account of config.yaml
+    for deployment in deployments:
+        if not deployment.matches(accounts, apps):
+            continue
+
+        acc = deployment.acc
+        env = {
+            'account': acc['accountId'],
+            'region': acc['region']
+        }
+        infra_stacks = []
+
+        if "infra" in stacks:
+            infra_stacks.append(CdkCodeStack(
                 main_app,
-                f"cdk-event-rule-{configd['fe']['code']['name']}-infra-{configd['acc']['project']['shortName']}-{configd['acc']['service_account']['accountId']}",
-                        env={
-                            'account': configd['acc']['service_account']['accountId'],
-                            'region': configd['acc']['service_account']['region']
-                        },
-                        config=configd
-                )
-            for key, value in configd['acc']['stack_tags'].items():
-                Tags.of(main_app).add(key=key, value=value)
+                deployment.infra_stack_id,
+                env=env,
+                config=deployment.config
+            ))
+
+            # Same infrastructure in the additional regions, served through latency based DNS records
+            for region in acc.get('regions') or []:
+                configr = regional_config(deployment.config, region)
+                infra_stacks.append(CdkCodeStack(
+                    main_app,
+                    deployment.regional_infra_stack_id(region['region']),
+                    env={
+                        'account': configr['acc']['accountId'],
+                        'region': configr['acc']['region']
+                    },
+                    config=configr
+                ))
+
+            for stack in infra_stacks:
+                tag_stack(stack, acc['stack_tags'])
+
+        if "pipeline" in stacks:
+            pipeline_stack = FeBuildDeploy(
+                main_app,
+                deployment.pipeline_stack_id,
+                env=env,
+                config=deployment.config
+            )
+            tag_stack(pipeline_stack, acc['stack_tags'])
+
+            # The pipeline deploys to the services of the infra stacks
+            for stack in infra_stacks:
+                pipeline_stack.add_dependency(stack)
+
+        if "events" in stacks:
+            events_stack = EventRulesServiceAccountStack(
+                main_app,
+                deployment.events_stack_id,
+                env={
+                    'account': acc['service_account']['accountId'],
+                    'region': acc['service_account']['region']
+                },
+                config=deployment.config
+            )
+            tag_stack(events_stack, acc['stack_tags'])
+
+    # Slow or unbounded settings are reported when the stacks are synthesized
+    if config.get('performance_policy'):
+        Aspects.of(main_app).add(PerformancePolicy(config['performance_policy'], APP_DIR))
 
     return main_app
 
@@ -0,0 +1,101 @@
+import json
+import os
+import re
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+SITE_URL = os.environ["SITE_URL"].rstrip("/")
+URL_BUDGET = int(os.environ["URL_BUDGET"])
+CONCURRENCY = int(os.environ["CONCURRENCY"])
+IMAGE_SIZES = [size for size in os.environ.get("IMAGE_SIZES", "").split() if size]
+REPORT_FILE = os.environ.get("REPORT_FILE", "cache-warmer-report.json")
+TIMEOUT = 30
+
+URL = re.compile(r"<url>(.*?)</url>", re.S)
+LOC = re.compile(r"<loc>\s*([^<\s]+)\s*</loc>")
+IMAGE_LOC = re.compile(r"<image:loc>\s*([^<\s]+)\s*</image:loc>")
+
+
+def fetch(url):
+    request = urllib.request.Request(url, headers={"User-Agent": "ghost-cache-warmer"})
+    with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+        return response.read().decode("utf-8")
+
+
+def sitemap_urls():
+    # sitemap.xml is an index of the pages, posts, authors and tags sitemaps, in the order Ghost lists them.
+    # Every page is followed by the variants of its own images, so the budget does not end before the first image
+    urls = []
+    for sitemap in LOC.findall(fetch(f"{SITE_URL}/sitemap.xml")):
+        for entry in URL.findall(fetch(sitemap)):
+            urls += LOC.findall(entry)
+            for image in IMAGE_LOC.findall(entry):
+                urls += image_variants(image)
+    return urls
+
+
+def image_variants(image):
+    # Ghost resizes uploaded images on the first request of /content/images/size/w<width>/...
+    marker = "/content/images/"
+    if marker not in image:
+        return [image]
+    prefix, path = image.split(marker, 1)
+    return [image] + [f"{prefix}{marker}size/w{size}/{path}" for size in IMAGE_SIZES]
+
+
+def warm(url):
+    request = urllib.request.Request(url, headers={"User-Agent": "ghost-cache-warmer", "Accept-Encoding": "gzip, br"})
+    start = time.monotonic()
+    try:
+        with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+            response.read()
+            status = response.status
+            cache = response.headers.get("X-Cache") or response.headers.get("X-Cache-Status") or ""
+    except urllib.error.HTTPError as error:
+        status, cache = error.code, ""
+    except (urllib.error.URLError, TimeoutError) as error:
+        status, cache = 0, f"{error}"
+    return {"url": url, "status": status, "cache": cache, "latency": time.monotonic() - start}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    urls = list(dict.fromkeys([f"{SITE_URL}/"] + sitemap_urls()))[:URL_BUDGET]
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        results = list(executor.map(warm, urls))
+
+    latencies = [result["latency"] for result in results]
+    report = {
+        "site_url": SITE_URL,
+        "requests": len(results),
+        "errors": sum(1 for result in results if not 200 <= result["status"] < 400),
+        "hits": sum(1 for result in results if "hit" in result["cache"].lower()),
+        "latency_p50": round(statistics.median(latencies), 3) if latencies else 0,
+        "latency_p95": round(percentile(latencies, 0.95), 3),
+        "latency_max": round(max(latencies), 3) if latencies else 0,
+        "results": results
+    }
+
+    with open(REPORT_FILE, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+
+    print(json.dumps({key: value for key, value in report.items() if key != "results"}, indent=2))
+    for result in sorted(results, key=lambda result: result["latency"], reverse=True)[:10]:
+        print(f"{result['status']} {result['latency']:.3f}s {result['cache'] or '-'} {result['url']}")
+
+    # A warmer that reaches nothing points at a broken deployment, single failed URLs do not fail the stage
+    sys.exit(1 if results and report["errors"] == len(results) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import base64
+import io
+import mimetypes
+import os
+import re
+
+import boto3
+from PIL import Image, ImageOps
+
+BUCKET = os.environ["BUCKET"]
+ORIGIN_VERIFY = os.environ["ORIGIN_VERIFY"]
+WIDTHS = {int(width) for width in os.environ["WIDTHS"].split()}
+QUALITY = int(os.environ["QUALITY"])
+CACHE_CONTROL = "public, max-age=31536000"
+
+# Same layout as the size URLs Ghost generates, e.g. /content/images/size/w600/format/webp/2024/01/photo.jpg
+SIZE_PATH = re.compile(r"^/(content/images)/size/w(\d+)(?:h\d+)?/(?:format/(webp|jpeg|png)/)?(.+)$")
+
+FORMATS = {"jpeg": ("JPEG", "image/jpeg"), "png": ("PNG", "image/png"), "webp": ("WEBP", "image/webp")}
+
+s3 = boto3.client("s3")
+
+
+def response(status, body=b"", content_type="text/plain"):
+    return {
+        "statusCode": status,
+        "headers": {"Content-Type": content_type, "Cache-Control": CACHE_CONTROL if status == 200 else "no-store"},
+        "body": base64.b64encode(body).decode("ascii"),
+        "isBase64Encoded": True
+    }
+
+
+def read(key):
+    try:
+        image = s3.get_object(Bucket=BUCKET, Key=key)
+    except s3.exceptions.NoSuchKey:
+        return None, None
+    return image["Body"].read(), image.get("ContentType")
+
+
+def resize(original, width, image_format):
+    image = Image.open(io.BytesIO(original))
+    # Animated images are served unchanged, like Ghost does
+    if getattr(image, "is_animated", False):
+        return original, Image.MIME.get(image.format)
+
+    target = FORMATS.get(image_format) or FORMATS.get((image.format or "").lower()) or FORMATS["jpeg"]
+    image = ImageOps.exif_transpose(image)
+    if image.width > width:
+        image.thumbnail((width, image.height * width // image.width), Image.LANCZOS)
+    if target[0] == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    output = io.BytesIO()
+    image.save(output, target[0], quality=QUALITY, optimize=True)
+    return output.getvalue(), target[1]
+
+
+def handler(event, context):
+    # The function URL is public, only requests that come through CloudFront carry the header
+    if event.get("headers", {}).get("x-origin-verify") != ORIGIN_VERIFY:
+        return response(403, b"Forbidden")
+
+    match = SIZE_PATH.match(event["rawPath"])
+    if not match or int(match.group(2)) not in WIDTHS:
+        return response(404, b"Not found")
+
+    prefix, width, image_format, path = match.groups()
+    variant_key = event["rawPath"].lstrip("/")
+
+    # Variants are stored next to the originals, so each one is only generated once
+    variant, content_type = read(variant_key)
+    if variant is not None:
+        return response(200, variant, content_type)
+
+    original, content_type = read(f"{prefix}/{path}")
+    if original is None:
+        return response(404, b"Not found")
+
+    try:
+        variant, content_type = resize(original, int(width), image_format)
+    except Image.UnidentifiedImageError:
+        # SVG and other formats Pillow cannot read are served as uploaded
+        variant, content_type = original, content_type or mimetypes.guess_type(path)[0]
+
+    s3.put_object(Bucket=BUCKET, Key=variant_key, Body=variant, ContentType=content_type, CacheControl=CACHE_CONTROL)
+    return response(200, variant, content_type)
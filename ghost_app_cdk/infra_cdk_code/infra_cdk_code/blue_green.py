@@ -0,0 +1,165 @@
+from aws_cdk import (
+    Duration,
+    aws_cloudwatch as cloudwatch,
+    aws_codedeploy as codedeploy,
+    aws_ecs as ecs,
+    aws_elasticloadbalancingv2 as elbv2
+)
+
+from constructs import Construct
+
+# Traffic shifting of the deployment, the step percentage and bake time come from config.yaml
+TRAFFIC_ROUTINGS = ["canary", "linear", "all_at_once"]
+
+class GhostBlueGreen(Construct):
+
+    def __init__(self, scope: Construct, construct_id: str, *, fargate_service: ecs.FargateService,
+                 load_balancer: elbv2.ApplicationLoadBalancer, listener: elbv2.ApplicationListener,
+                 test_listener: elbv2.ApplicationListener, blue_target_group: elbv2.ApplicationTargetGroup,
+                 green_target_group: elbv2.ApplicationTargetGroup, config: dict) -> None:
+        super().__init__(scope, construct_id)
+
+        cfg_fe_name = config['fe']['code']['name']
+        cfg_blue_green = config['fe']['ecs']['deployment']['blue_green']
+        cfg_traffic_routing = cfg_blue_green.get('traffic_routing') or "canary"
+        cfg_rollback_alarms = cfg_blue_green['rollback_alarms']
+
+        if cfg_traffic_routing not in TRAFFIC_ROUTINGS:
+            raise RuntimeError(
+                f"Unknown traffic_routing {cfg_traffic_routing} of {cfg_fe_name}, choose from {', '.join(TRAFFIC_ROUTINGS)}"
+            )
+
+        if cfg_traffic_routing == "canary":
+            traffic_routing = codedeploy.TrafficRouting.time_based_canary(
+                interval=Duration.minutes(cfg_blue_green['bake_minutes']),
+                percentage=cfg_blue_green['step_percentage']
+            )
+        elif cfg_traffic_routing == "linear":
+            traffic_routing = codedeploy.TrafficRouting.time_based_linear(
+                interval=Duration.minutes(cfg_blue_green['bake_minutes']),
+                percentage=cfg_blue_green['step_percentage']
+            )
+        else:
+            traffic_routing = codedeploy.TrafficRouting.all_at_once()
+
+        period = Duration.minutes(1)
+
+        # The target groups swap roles on every deployment, so both are watched. During a canary
+        # step the new target group only gets its share of the traffic and regressions show there first
+        alarms = []
+        for color, target_group in [("blue", blue_target_group), ("green", green_target_group)]:
+            tg_dimensions = {
+                "LoadBalancer": load_balancer.load_balancer_full_name,
+                "TargetGroup": target_group.target_group_full_name
+            }
+
+            for statistic in ["p95", "p99"]:
+                alarms.append(cloudwatch.Alarm(
+                    self, f"{color}{statistic}latencyalarm",
+                    alarm_description=f"{statistic} response time of the {color} target group of {cfg_fe_name} "
+                                      "is too high, rolls back a running deployment",
+                    metric=cloudwatch.Metric(
+                        namespace="AWS/ApplicationELB",
+                        metric_name="TargetResponseTime",
+                        dimensions_map=tg_dimensions,
+                        statistic=statistic,
+                        period=period
+                    ),
+                    threshold=cfg_rollback_alarms[f"response_time_{statistic}"],
+                    evaluation_periods=cfg_rollback_alarms['evaluation_periods'],
+                    comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                    treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+                ))
+
+            alarms.append(cloudwatch.Alarm(
+                self, f"{color}error5xxalarm",
+                alarm_description=f"5xx rate of the {color} target group of {cfg_fe_name} is too high, "
+                                  "rolls back a running deployment",
+                metric=cloudwatch.MathExpression(
+                    expression="100 * FILL(errors, 0) / requests",
+                    using_metrics={
+                        "errors": cloudwatch.Metric(
+                            namespace="AWS/ApplicationELB",
+                            metric_name="HTTPCode_Target_5XX_Count",
+                            dimensions_map=tg_dimensions,
+                            statistic="Sum",
+                            period=period
+                        ),
+                        "requests": cloudwatch.Metric(
+                            namespace="AWS/ApplicationELB",
+                            metric_name="RequestCount",
+                            dimensions_map=tg_dimensions,
+                            statistic="Sum",
+                            period=period
+                        )
+                    },
+                    label=f"Target 5xx rate of the {color} target group (%)",
+                    period=period
+                ),
+                threshold=cfg_rollback_alarms['error_rate_5xx'],
+                evaluation_periods=cfg_rollback_alarms['evaluation_periods'],
+                comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+            ))
+
+        # 5xx the load balancer answers itself, e.g. 502 and 503 when new tasks fail or no target is healthy, are
+        # not in the target group metrics. RequestCount leaves out requests without a target, so they are added back
+        lb_dimensions = {"LoadBalancer": load_balancer.load_balancer_full_name}
+        alarms.append(cloudwatch.Alarm(
+            self, "elberror5xxalarm",
+            alarm_description=f"5xx rate of the load balancer of {cfg_fe_name} is too high, "
+                              "rolls back a running deployment",
+            metric=cloudwatch.MathExpression(
+                expression="100 * FILL(errors, 0) / (FILL(requests, 0) + FILL(errors, 0))",
+                using_metrics={
+                    "errors": cloudwatch.Metric(
+                        namespace="AWS/ApplicationELB",
+                        metric_name="HTTPCode_ELB_5XX_Count",
+                        dimensions_map=lb_dimensions,
+                        statistic="Sum",
+                        period=period
+                    ),
+                    "requests": cloudwatch.Metric(
+                        namespace="AWS/ApplicationELB",
+                        metric_name="RequestCount",
+                        dimensions_map=lb_dimensions,
+                        statistic="Sum",
+                        period=period
+                    )
+                },
+                label="ELB 5xx rate of the load balancer (%)",
+                period=period
+            ),
+            threshold=cfg_rollback_alarms['error_rate_5xx'],
+            evaluation_periods=cfg_rollback_alarms['evaluation_periods'],
+            comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+            treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+        ))
+
+        # The pipeline stack imports the application and deployment group by the name of the app
+        self.deployment_group = codedeploy.EcsDeploymentGroup(
+            self, "deploymentgroup",
+            application=codedeploy.EcsApplication(
+                self, "application",
+                application_name=cfg_fe_name
+            ),
+            deployment_group_name=cfg_fe_name,
+            service=fargate_service,
+            deployment_config=codedeploy.EcsDeploymentConfig(
+                self, "deploymentconfig",
+                traffic_routing=traffic_routing
+            ),
+            blue_green_deployment_config=codedeploy.EcsBlueGreenDeploymentConfig(
+                blue_target_group=blue_target_group,
+                green_target_group=green_target_group,
+                listener=listener,
+                test_listener=test_listener,
+                termination_wait_time=Duration.minutes(cfg_blue_green['termination_wait'])
+            ),
+            alarms=alarms,
+            auto_rollback=codedeploy.AutoRollbackConfig(
+                failed_deployment=True,
+                stopped_deployment=True,
+                deployment_in_alarm=True
+            )
+        )
@@ -0,0 +1,73 @@
+from aws_cdk import (
+    aws_ec2 as ec2,
+    aws_elasticache as elasticache
+)
+
+from constructs import Construct
+
+# Ghost cache features moved to the shared adapter and their TTL keys in config.yaml
+GHOST_CACHE_FEATURES = {
+    "settings": "settings",
+    "imageSizes": "image_sizes",
+    "postsPublic": "posts_public"
+}
+
+class GhostCache(Construct):
+
+    def __init__(self, scope: Construct, construct_id: str, *, vpc: ec2.IVpc, vpc_subnets: ec2.SubnetSelection, client_security_group: ec2.ISecurityGroup, config: dict) -> None:
+        super().__init__(scope, construct_id)
+
+        cfg_fe_name = config['fe']['code']['name']
+        cfg_cache = config['fe']['cache']
+
+        cfg_cache_engine = cfg_cache.get('engine') or "redis"
+        cfg_cache_engine_version = cfg_cache['engine_version']
+        cfg_cache_node_type = cfg_cache['node_type']
+        cfg_cache_nodes = cfg_cache['nodes']
+        cfg_cache_key_prefix = cfg_cache['key_prefix']
+        cfg_cache_ttl = cfg_cache['ttl']
+
+        cache_security_group = ec2.SecurityGroup(
+            self, "cachesg",
+            allow_all_outbound=False,
+            vpc=vpc
+        )
+
+        cache_security_group.add_ingress_rule(
+            client_security_group,
+            ec2.Port.tcp(6379),
+            f"Connections from the {cfg_fe_name} tasks to the cache"
+        )
+
+        subnet_group = elasticache.CfnSubnetGroup(
+            self, "subnetgroup",
+            description=f"Subnets of the {cfg_fe_name} cache",
+            subnet_ids=vpc.select_subnets(availability_zones=vpc_subnets.availability_zones).subnet_ids
+        )
+
+        self.replication_group = elasticache.CfnReplicationGroup(
+            self, "replicationgroup",
+            replication_group_description=f"Shared Ghost caches of {cfg_fe_name}",
+            engine=cfg_cache_engine,
+            engine_version=f"{cfg_cache_engine_version}",
+            cache_node_type=cfg_cache_node_type,
+            num_cache_clusters=cfg_cache_nodes,
+            automatic_failover_enabled=cfg_cache_nodes > 1,
+            multi_az_enabled=cfg_cache_nodes > 1,
+            cache_subnet_group_name=subnet_group.ref,
+            security_group_ids=[cache_security_group.security_group_id]
+        )
+
+        self.container_environment = {
+            "adapters__cache__Redis__host": self.replication_group.attr_primary_end_point_address,
+            "adapters__cache__Redis__port": self.replication_group.attr_primary_end_point_port,
+            "adapters__cache__Redis__keyPrefix": cfg_cache_key_prefix,
+            "adapters__cache__Redis__ttl": f"{cfg_cache_ttl['default']}",
+            "adapters__cache__Redis__reuseConnection": "true",
+            "hostSettings__postsPublicCache__enabled": "true"
+        }
+
+        for feature, ttl_key in GHOST_CACHE_FEATURES.items():
+            self.container_environment[f"adapters__cache__{feature}__adapter"] = "Redis"
+            self.container_environment[f"adapters__cache__{feature}__ttl"] = f"{cfg_cache_ttl[ttl_key]}"
+            self.container_environment[f"adapters__cache__{feature}__keyPrefix"] = f"{cfg_cache_key_prefix}{feature}:"
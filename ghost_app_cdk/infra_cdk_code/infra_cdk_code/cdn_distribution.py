@@ -0,0 +1,168 @@
+from aws_cdk import (
+    Duration,
+    aws_certificatemanager as acm,
+    aws_cloudfront as cloudfront,
+    aws_cloudfront_origins as origins
+)
+
+from constructs import Construct
+
+from infra_cdk_code.media_storage import GhostMediaStorage
+
+# Cookies that identify a logged in member or staff user, HTML is cached per value
+GHOST_SESSION_COOKIES = [
+    "ghost-members-ssr",
+    "ghost-members-ssr.sig",
+    "ghost-admin-api-session"
+]
+
+# Admin and members API paths that must always reach Ghost
+GHOST_UNCACHED_PATHS = [
+    "/ghost/*",
+    "/members/*"
+]
+
+# Theme assets and uploaded images, versioned with a query string by Ghost
+GHOST_STATIC_PATHS = [
+    "/assets/*",
+    "/content/images/*"
+]
+
+class CdnDistribution(Construct):
+
+    def __init__(self, scope: Construct, construct_id: str, *, origin_domain_name: str, origin_port: int, media: GhostMediaStorage = None, config: dict) -> None:
+        super().__init__(scope, construct_id)
+
+        cfg_fe_name = config['fe']['code']['name']
+        cfg_cdn = config['fe']['cdn']
+
+        cfg_cdn_domain_names = cfg_cdn.get('domain_names') or None
+        cfg_cdn_certificate_arn = cfg_cdn.get('certificate_arn')
+        cfg_cdn_price_class = cfg_cdn.get('price_class') or "PRICE_CLASS_100"
+        cfg_cdn_origin_shield_region = cfg_cdn.get('origin_shield_region')
+        cfg_cdn_static_default_ttl = cfg_cdn['static']['default_ttl']
+        cfg_cdn_static_max_ttl = cfg_cdn['static']['max_ttl']
+        cfg_cdn_html_ttl = cfg_cdn['html']['ttl']
+        cfg_cdn_html_swr = cfg_cdn['html']['stale_while_revalidate']
+
+        origin = origins.HttpOrigin(
+            origin_domain_name,
+            protocol_policy=cloudfront.OriginProtocolPolicy.HTTPS_ONLY,
+            https_port=origin_port,
+            origin_shield_region=cfg_cdn_origin_shield_region,
+            origin_shield_enabled=bool(cfg_cdn_origin_shield_region)
+        )
+
+        static_cache_policy = cloudfront.CachePolicy(
+            self, "static-cache-policy",
+            cache_policy_name=f"{cfg_fe_name}-static",
+            comment="Long lived theme assets and images",
+            default_ttl=Duration.seconds(cfg_cdn_static_default_ttl),
+            min_ttl=Duration.seconds(cfg_cdn_static_default_ttl),
+            max_ttl=Duration.seconds(cfg_cdn_static_max_ttl),
+            cookie_behavior=cloudfront.CacheCookieBehavior.none(),
+            header_behavior=cloudfront.CacheHeaderBehavior.none(),
+            query_string_behavior=cloudfront.CacheQueryStringBehavior.all(),
+            enable_accept_encoding_gzip=True,
+            enable_accept_encoding_brotli=True
+        )
+
+        # Ghost answers public pages with max-age=0, the minimum TTL keeps them at the edge
+        html_cache_policy = cloudfront.CachePolicy(
+            self, "html-cache-policy",
+            cache_policy_name=f"{cfg_fe_name}-html",
+            comment="Short lived public pages, keyed on the Ghost session cookies",
+            default_ttl=Duration.seconds(cfg_cdn_html_ttl),
+            min_ttl=Duration.seconds(cfg_cdn_html_ttl),
+            max_ttl=Duration.seconds(cfg_cdn_html_ttl + cfg_cdn_html_swr),
+            cookie_behavior=cloudfront.CacheCookieBehavior.allow_list(*GHOST_SESSION_COOKIES),
+            header_behavior=cloudfront.CacheHeaderBehavior.none(),
+            query_string_behavior=cloudfront.CacheQueryStringBehavior.all(),
+            enable_accept_encoding_gzip=True,
+            enable_accept_encoding_brotli=True
+        )
+
+        html_response_headers_policy = cloudfront.ResponseHeadersPolicy(
+            self, "html-response-headers-policy",
+            response_headers_policy_name=f"{cfg_fe_name}-html",
+            comment="Let browsers and shared caches serve stale pages while revalidating",
+            custom_headers_behavior=cloudfront.ResponseCustomHeadersBehavior(
+                custom_headers=[
+                    cloudfront.ResponseCustomHeader(
+                        header="Cache-Control",
+                        value=f"max-age={cfg_cdn_html_ttl}, stale-while-revalidate={cfg_cdn_html_swr}",
+                        override=True
+                    )
+                ]
+            )
+        )
+
+        static_behavior = cloudfront.BehaviorOptions(
+            origin=origin,
+            viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+            allowed_methods=cloudfront.AllowedMethods.ALLOW_GET_HEAD,
+            cache_policy=static_cache_policy,
+            compress=True
+        )
+
+        uncached_behavior = cloudfront.BehaviorOptions(
+            origin=origin,
+            viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+            allowed_methods=cloudfront.AllowedMethods.ALLOW_ALL,
+            cache_policy=cloudfront.CachePolicy.CACHING_DISABLED,
+            origin_request_policy=cloudfront.OriginRequestPolicy.ALL_VIEWER,
+            compress=True
+        )
+
+        additional_behaviors = {}
+
+        # Resized images come from the resize service, the more specific path has to be listed first
+        if media and media.resize_function_url:
+            additional_behaviors["/content/images/size/*"] = cloudfront.BehaviorOptions(
+                origin=origins.FunctionUrlOrigin(
+                    media.resize_function_url,
+                    custom_headers={"x-origin-verify": media.origin_verify},
+                    origin_shield_region=cfg_cdn_origin_shield_region,
+                    origin_shield_enabled=bool(cfg_cdn_origin_shield_region)
+                ),
+                viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                allowed_methods=cloudfront.AllowedMethods.ALLOW_GET_HEAD,
+                cache_policy=static_cache_policy,
+                compress=True
+            )
+
+        for path in GHOST_STATIC_PATHS:
+            additional_behaviors[path] = static_behavior
+
+        # Uploaded originals are read straight from the media bucket
+        if media:
+            additional_behaviors["/content/images/*"] = cloudfront.BehaviorOptions(
+                origin=origins.S3Origin(media.bucket),
+                viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                allowed_methods=cloudfront.AllowedMethods.ALLOW_GET_HEAD,
+                cache_policy=static_cache_policy,
+                compress=True
+            )
+        for path in GHOST_UNCACHED_PATHS:
+            additional_behaviors[path] = uncached_behavior
+
+        self.distribution = cloudfront.Distribution(
+            self, "distribution",
+            comment=f"Edge cache for {cfg_fe_name}",
+            domain_names=cfg_cdn_domain_names,
+            certificate=acm.Certificate.from_certificate_arn(
+                self, "certificate",
+                certificate_arn=cfg_cdn_certificate_arn
+            ) if cfg_cdn_certificate_arn else None,
+            price_class=cloudfront.PriceClass[cfg_cdn_price_class],
+            http_version=cloudfront.HttpVersion.HTTP2_AND_3,
+            default_behavior=cloudfront.BehaviorOptions(
+                origin=origin,
+                viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                allowed_methods=cloudfront.AllowedMethods.ALLOW_GET_HEAD,
+                cache_policy=html_cache_policy,
+                response_headers_policy=html_response_headers_policy,
+                compress=True
+            ),
+            additional_behaviors=additional_behaviors
+        )
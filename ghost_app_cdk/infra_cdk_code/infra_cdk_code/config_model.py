@@ -0,0 +1,158 @@
+import copy
+import sys
+from dataclasses import dataclass
+
+# Keys every account of aws_vars needs, nested keys are separated with a dot
+REQUIRED_ACCOUNT_KEYS = [
+    "region",
+    "env",
+    "accountId",
+    "resources.vpcId",
+    "service_account.accountId",
+    "service_account.region",
+    "service_account.crossAccountRole",
+    "project.shortName",
+    "project.client",
+    "stack_tags"
+]
+
+# Keys every app of frontend-ghost-app needs
+REQUIRED_APP_KEYS = [
+    "code.name",
+    "code.sourceRepo",
+    "code.sourceBranch",
+    "code.buildspec_path",
+    "code.base_image_repository_arn",
+    "code.buildspec_bucket_arn",
+    "ecs.cluster_name",
+    "ecs.td_cpu",
+    "ecs.td_memory",
+    "ecs.container_cpu",
+    "ecs.container_memory",
+    "ecs.host_port",
+    "ecs.container_port",
+    "ecs.deployment",
+    "lb.targer_port",
+    "lb.certificate_arn"
+]
+
+REQUIRED_REGION_KEYS = [
+    "region",
+    "vpcId",
+    "certificate_arn"
+]
+
+
+@dataclass(frozen=True)
+class Deployment:
+    """One app of frontend-ghost-app in one account of aws_vars"""
+    account_key: str
+    app_key: str
+    acc: dict
+    fe: dict
+
+    @property
+    def config(self) -> dict:
+        """
+        Config passed to the stacks, a deep copy for every stack so a stack cannot change the settings of another one
+        :return: dict with the acc and fe items
+        """
+        return copy.deepcopy({'acc': self.acc, 'fe': self.fe})
+
+    @property
+    def infra_stack_id(self) -> str:
+        return f"cdk-fe-ghost-app-infra-pipeline-{self.acc['project']['shortName']}-{self.acc['accountId']}"
+
+    def regional_infra_stack_id(self, region: str) -> str:
+        return f"{self.infra_stack_id}-{region}"
+
+    @property
+    def pipeline_stack_id(self) -> str:
+        return f"cdk-ghost-app-deployment-pipeline-{self.acc['project']['shortName']}-{self.acc['accountId']}"
+
+    @property
+    def events_stack_id(self) -> str:
+        return f"cdk-event-rule-{self.fe['code']['name']}-infra-{self.acc['project']['shortName']}-{self.acc['service_account']['accountId']}"
+
+    def matches(self, accounts: list, apps: list) -> bool:
+        """
+        Check the deployment against the account and app filters, empty filters match everything
+        :return: True when the stacks of the deployment are built
+        """
+        return (not accounts or self.account_key in accounts or f"{self.acc['accountId']}" in accounts) and \
+            (not apps or self.app_key in apps or self.fe['code']['name'] in apps)
+
+
+def service_name_parameter(acc: dict, fe: dict) -> str:
+    """
+    SSM parameter with the name of the ECS service, the infra stack writes it in every region
+    :return: name of the parameter
+    """
+    return f"{acc['env']}.ecs-service-name.{fe['code']['name']}"
+
+
+def select(section: dict, key: str, name: str) -> tuple:
+    """
+    Pick one entry of a config section for the command line tools, the first one when no key is given
+    :return: tuple with the key and its settings
+    """
+    key = key or next(iter(section))
+    if key not in section:
+        sys.exit(f"{key} is not one of the {name} in the config: {', '.join(section)}")
+    return key, section[key]
+
+
+def missing_keys(items: dict, keys: list) -> list:
+    missing = []
+    for key in keys:
+        value = items
+        for part in key.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        if value is None or value == "":
+            missing.append(key)
+    return missing
+
+
+def parse_config(config: dict) -> list:
+    """
+    Validate config.yaml once and split it into the deployments of every account and app
+    :return: list of Deployment
+    """
+    errors = []
+    deployments = []
+
+    for account_key, acc in config['aws_vars'].items():
+        errors += [f"aws_vars.{account_key}.{key} is not set" for key in missing_keys(acc, REQUIRED_ACCOUNT_KEYS)]
+        for index, region in enumerate(acc.get('regions') or []):
+            errors += [f"aws_vars.{account_key}.regions[{index}].{key} is not set" for key in missing_keys(region, REQUIRED_REGION_KEYS)]
+
+        short_name = (acc.get('project') or {}).get('shortName')
+        if short_name and short_name != short_name.lower():
+            errors.append(f"aws_vars.{account_key}.project.shortName must be lowercase, it is part of S3 bucket names")
+
+        for app_key, fe in config['frontend-ghost-app'].items():
+            deployments.append(Deployment(account_key, app_key, acc, fe))
+            # Every region would run its own Aurora cluster, readers would get different posts, members and sessions
+            if acc.get('regions') and fe.get('database'):
+                errors.append(f"aws_vars.{account_key}.regions cannot be combined with frontend-ghost-app.{app_key}.database, "
+                              "the database is not shared between regions")
+            # Every region would store uploads in its own bucket, while CloudFront reads /content/images/ from the main one
+            if acc.get('regions') and fe.get('media'):
+                errors.append(f"aws_vars.{account_key}.regions cannot be combined with frontend-ghost-app.{app_key}.media, "
+                              "the media bucket is not shared between regions")
+
+    for app_key, fe in config['frontend-ghost-app'].items():
+        errors += [f"frontend-ghost-app.{app_key}.{key} is not set" for key in missing_keys(fe, REQUIRED_APP_KEYS)]
+
+    if errors:
+        raise RuntimeError("Invalid config.yaml:\n  " + "\n  ".join(errors))
+
+    stack_ids = [stack_id for deployment in deployments
+                 for stack_id in (deployment.infra_stack_id, deployment.pipeline_stack_id, deployment.events_stack_id)]
+    duplicates = sorted({stack_id for stack_id in stack_ids if stack_ids.count(stack_id) > 1})
+    if duplicates:
+        raise RuntimeError(
+            f"Several accounts/apps of config.yaml map to the same stacks, give them different project.shortName: {', '.join(duplicates)}"
+        )
+
+    return deployments
@@ -0,0 +1,119 @@
+from aws_cdk import (
+    Duration, RemovalPolicy,
+    aws_ec2 as ec2,
+    aws_ecs as ecs,
+    aws_rds as rds
+)
+
+from constructs import Construct
+
+class GhostDatabase(Construct):
+
+    def __init__(self, scope: Construct, construct_id: str, *, vpc: ec2.IVpc, vpc_subnets: ec2.SubnetSelection, client_security_group: ec2.ISecurityGroup, config: dict) -> None:
+        super().__init__(scope, construct_id)
+
+        cfg_fe_name = config['fe']['code']['name']
+        cfg_db = config['fe']['database']
+
+        cfg_db_mode = cfg_db.get('mode') or "serverless"
+        cfg_db_engine_version = cfg_db['engine_version']
+        cfg_db_name = cfg_db['database_name']
+        cfg_db_readers = cfg_db.get('readers') or 0
+        cfg_db_proxy = cfg_db['proxy']
+        cfg_db_pool = cfg_db['pool']
+
+        db_security_group = ec2.SecurityGroup(
+            self, "dbsg",
+            allow_all_outbound=True,
+            vpc=vpc
+        )
+
+        db_security_group.add_ingress_rule(
+            client_security_group,
+            ec2.Port.tcp(3306),
+            f"Connections from the {cfg_fe_name} tasks to RDS Proxy"
+        )
+
+        db_security_group.add_ingress_rule(
+            db_security_group,
+            ec2.Port.tcp(3306),
+            f"Connections from RDS Proxy to the {cfg_fe_name} cluster"
+        )
+
+        if cfg_db_mode == "provisioned":
+            writer = rds.ClusterInstance.provisioned(
+                "writer",
+                instance_type=ec2.InstanceType(cfg_db['instance_type'])
+            )
+            readers = [
+                rds.ClusterInstance.provisioned(
+                    f"reader{index}",
+                    instance_type=ec2.InstanceType(cfg_db['instance_type'])
+                ) for index in range(cfg_db_readers)
+            ]
+        else:
+            writer = rds.ClusterInstance.serverless_v2("writer")
+            readers = [
+                rds.ClusterInstance.serverless_v2(
+                    f"reader{index}",
+                    scale_with_writer=True
+                ) for index in range(cfg_db_readers)
+            ]
+
+        self.cluster = rds.DatabaseCluster(
+            self, "cluster",
+            engine=rds.DatabaseClusterEngine.aurora_mysql(
+                version=rds.AuroraMysqlEngineVersion.of(cfg_db_engine_version, "8.0")
+            ),
+            credentials=rds.Credentials.from_generated_secret("ghost"),
+            default_database_name=cfg_db_name,
+            writer=writer,
+            readers=readers,
+            serverless_v2_min_capacity=cfg_db['min_capacity'] if cfg_db_mode == "serverless" else None,
+            serverless_v2_max_capacity=cfg_db['max_capacity'] if cfg_db_mode == "serverless" else None,
+            vpc=vpc,
+            vpc_subnets=vpc_subnets,
+            security_groups=[db_security_group],
+            storage_encrypted=True,
+            removal_policy=RemovalPolicy.SNAPSHOT
+        )
+
+        # RDS Proxy pools the connections of all tasks, so scaling out does not exhaust the cluster
+        self.proxy = self.cluster.add_proxy(
+            "proxy",
+            secrets=[self.cluster.secret],
+            vpc=vpc,
+            vpc_subnets=vpc_subnets,
+            security_groups=[db_security_group],
+            require_tls=True,
+            max_connections_percent=cfg_db_proxy['max_connections_percent'],
+            max_idle_connections_percent=cfg_db_proxy['max_idle_connections_percent'],
+            borrow_timeout=Duration.seconds(cfg_db_proxy['borrow_timeout'])
+        )
+
+        self.reader_endpoint = None
+        if cfg_db_readers:
+            self.reader_endpoint = rds.CfnDBProxyEndpoint(
+                self, "proxyreaderendpoint",
+                db_proxy_endpoint_name=f"{cfg_fe_name}-read-only",
+                db_proxy_name=self.proxy.db_proxy_name,
+                vpc_subnet_ids=vpc.select_subnets(availability_zones=vpc_subnets.availability_zones).subnet_ids,
+                vpc_security_group_ids=[db_security_group.security_group_id],
+                target_role="READ_ONLY"
+            )
+
+        # The proxy certificate is issued by a public CA, so Node's default trust store verifies it
+        self.container_environment = {
+            "database__client": "mysql",
+            "database__connection__host": self.proxy.endpoint,
+            "database__connection__port": "3306",
+            "database__connection__database": cfg_db_name,
+            "database__connection__ssl__rejectUnauthorized": "true",
+            "database__pool__min": f"{cfg_db_pool['min']}",
+            "database__pool__max": f"{cfg_db_pool['max']}"
+        }
+
+        self.container_secrets = {
+            "database__connection__user": ecs.Secret.from_secrets_manager(self.cluster.secret, "username"),
+            "database__connection__password": ecs.Secret.from_secrets_manager(self.cluster.secret, "password")
+        }
@@ -1,7 +1,11 @@
+import json
+import os
+
 from aws_cdk import (
     Stack, CfnOutput, RemovalPolicy, RemovalPolicy,
     Duration,
     aws_s3 as s3,
+    aws_s3_assets as s3_assets,
     aws_ec2 as ec2,
     aws_ecr as _ecr,
     aws_ecs as ecs,
@@ -9,15 +13,20 @@ from aws_cdk import (
     aws_codepipeline as codepipeline,
     aws_codepipeline_actions,
     aws_codecommit as codecommit,
+    aws_codedeploy as codedeploy,
     aws_ssm as ssm,
     aws_iam as iam,
     aws_kms as kms,
     aws_events as events,
     aws_events_targets,
+    aws_lambda as _lambda,
 )
 
 from constructs import Construct
 
+from infra_cdk_code.performance_policy import PerformancePolicy
+from infra_cdk_code.config_model import service_name_parameter
+
 class FeBuildDeploy(Stack):
     def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
         config = kwargs.pop("config")
@@ -35,16 +44,87 @@ class FeBuildDeploy(Stack):
         cfg_repo = config['fe']['code']['sourceRepo']
         cfg_branch = config['fe']['code']['sourceBranch']
         cfg_buildspec = config['fe']['code']['buildspec_path']
-        cfg_ecs_service_name = config['ecs_service_name']
+        cfg_base_image_repository_arn = config['fe']['code']['base_image_repository_arn']
+        cfg_buildspec_bucket_arn = config['fe']['code']['buildspec_bucket_arn']
+        cfg_build_compute_type = config['fe']['code'].get('build_compute_type') or "SMALL"
+        cfg_build_cache_max_age = config['fe']['code'].get('build_cache_max_age') or 14
+        cfg_keep_releases = config['fe']['code'].get('keep_releases') or 20
+        cfg_image_platforms = config['fe']['code'].get('image_platforms') or ["linux/amd64"]
+        cfg_soci_index = config['fe']['code'].get('soci_index', False)
+        cfg_execution_mode = config['fe']['code'].get('execution_mode') or "SUPERSEDED"
+        cfg_trigger_paths = config['fe']['code'].get('trigger_paths')
+        cfg_cache_warmer = config['fe']['code'].get('cache_warmer')
+        cfg_regions = config['acc'].get('regions') or []
+        cfg_replication_regions = [region['region'] for region in cfg_regions]
+        # CdkCodeStack names the service after the app, so the pipeline stack can be built on its own
+        # Written by the infra stack, the service of the main region keeps the name CloudFormation generated
+        cfg_ecs_service_name = ssm.StringParameter.from_string_parameter_name(
+            self, "service_name_string",
+            string_parameter_name=service_name_parameter(config['acc'], config['fe'])
+        ).string_value
         cfg_ecs_cluster_name = config['fe']['ecs']['cluster_name']
         cfg_vc_con_port = config['fe']['ecs']['container_port']
-
+        cfg_deployment_timeout = config['fe']['ecs']['deployment']['deployment_timeout']
+        cfg_blue_green = config['fe']['ecs']['deployment'].get('blue_green')
+        # The load balancer sends the traffic to the nginx sidecar when there is one
+        cfg_nginx = config['fe'].get('nginx')
+        cfg_target_container_name = f"{cfg_app_name}-nginx" if cfg_nginx else f"{cfg_app_name}-container"
+        cfg_target_container_port = cfg_nginx['port'] if cfg_nginx else cfg_vc_con_port
+
+        # Every build pushes a commit-<sha> tag that never moves, the deploys and rollbacks pin its digest
         ecr = _ecr.Repository(
             self, "ecr",
             repository_name=f"{cfg_app_name}",
-            removal_policy=RemovalPolicy.DESTROY
+            removal_policy=RemovalPolicy.DESTROY,
+            image_tag_mutability=_ecr.TagMutability.IMMUTABLE,
+            lifecycle_rules=[
+                _ecr.LifecycleRule(
+                    description="Keep the newest releases available for a rollback",
+                    tag_status=_ecr.TagStatus.TAGGED,
+                    tag_prefix_list=["commit-"],
+                    max_image_count=cfg_keep_releases
+                )
+            ]
         )
 
+        # BuildKit layer cache exported by every build and imported by the next one
+        ecr_build_cache = _ecr.Repository(
+            self, "ecrbuildcache",
+            repository_name=f"{cfg_app_name}-build-cache",
+            removal_policy=RemovalPolicy.DESTROY,
+            lifecycle_rules=[
+                _ecr.LifecycleRule(
+                    description="Expire cache manifests replaced by newer builds",
+                    tag_status=_ecr.TagStatus.UNTAGGED,
+                    max_image_age=Duration.days(cfg_build_cache_max_age)
+                )
+            ]
+        )
+
+        # Copies of the image next to the tasks of the additional regions
+        if cfg_replication_regions:
+            _ecr.CfnReplicationConfiguration(
+                self, "ecrreplication",
+                replication_configuration=_ecr.CfnReplicationConfiguration.ReplicationConfigurationProperty(
+                    rules=[
+                        _ecr.CfnReplicationConfiguration.ReplicationRuleProperty(
+                            destinations=[
+                                _ecr.CfnReplicationConfiguration.ReplicationDestinationProperty(
+                                    region=region,
+                                    registry_id=cfg_account_id
+                                ) for region in cfg_replication_regions
+                            ],
+                            repository_filters=[
+                                _ecr.CfnReplicationConfiguration.RepositoryFilterProperty(
+                                    filter=ecr.repository_name,
+                                    filter_type="PREFIX_MATCH"
+                                )
+                            ]
+                        )
+                    ]
+                )
+            )
+
         artifacts_bucket = s3.Bucket(
             self, "artifacts_bucket",
             bucket_name=f"{cfg_env}.fr-artifacts.{cfg_account_id}.{cfg_project_short_name}.{cfg_project_client}.s3",
@@ -69,17 +149,35 @@ class FeBuildDeploy(Stack):
 
         buildproject = codebuild.PipelineProject(
             self, "buildproject",
+            project_name=f"{cfg_app_name}-build",
             build_spec=codebuild.BuildSpec.from_source_filename(
                 filename=cfg_buildspec),
             environment= codebuild.BuildEnvironment(
-                build_image=codebuild.LinuxBuildImage.STANDARD_5_0,
+                build_image=codebuild.LinuxBuildImage.STANDARD_7_0,
                 privileged=True,
-                compute_type=codebuild.ComputeType.SMALL,
+                compute_type=codebuild.ComputeType[cfg_build_compute_type],
+            ),
+            # The buildx docker-container builder keeps its own layer store, so only the registry cache of
+            # ecrbuildcache reaches the image build, the local cache keeps the source between builds
+            cache=codebuild.Cache.local(
+                codebuild.LocalCacheMode.SOURCE
             ),
 
             environment_variables={
                 'REPOSITORY_URI': codebuild.BuildEnvironmentVariable(
                     value=ecr.repository_uri),
+                'CACHE_REPOSITORY_URI': codebuild.BuildEnvironmentVariable(
+                    value=ecr_build_cache.repository_uri),
+                'IMAGE_PLATFORMS': codebuild.BuildEnvironmentVariable(
+                    value=",".join(cfg_image_platforms)),
+                'SOCI_ENABLED': codebuild.BuildEnvironmentVariable(
+                    value=f"{cfg_soci_index}".lower()),
+                'REPOSITORY_NAME': codebuild.BuildEnvironmentVariable(
+                    value=ecr.repository_name),
+                'CONTAINER_NAME': codebuild.BuildEnvironmentVariable(
+                    value=f"{cfg_app_name}-container"),
+                'REPLICATION_REGIONS': codebuild.BuildEnvironmentVariable(
+                    value=" ".join(cfg_replication_regions)),
                 'BRANCH': codebuild.BuildEnvironmentVariable(
                     value=cfg_branch),
                 'ACCOUNT_ID': codebuild.BuildEnvironmentVariable(
@@ -93,12 +191,19 @@ class FeBuildDeploy(Stack):
                     value=cfg_region),
                 'FAMILY': codebuild.BuildEnvironmentVariable(
                     value=f"{cfg_app_name}",),
+                'BLUE_GREEN': codebuild.BuildEnvironmentVariable(
+                    value=f"{bool(cfg_blue_green)}".lower()),
+                'TARGET_CONTAINER_NAME': codebuild.BuildEnvironmentVariable(
+                    value=cfg_target_container_name),
+                'TARGET_CONTAINER_PORT': codebuild.BuildEnvironmentVariable(
+                    value=f"{cfg_target_container_port}"),
             },
             description=f'Build docker image for {cfg_app_name}',
             vpc=vpc
         )
 
         ecr.grant_pull_push(buildproject)
+        ecr_build_cache.grant_pull_push(buildproject)
 
         artifacts_bucket.grant_read_write(buildproject)
 
@@ -121,7 +226,7 @@ class FeBuildDeploy(Stack):
                     "ecr:GetDownloadUrlForLayer",
                     "ecr:BatchGetImage"
                 ],
-                resources=[] # Add the ARN of the ECR that hosts the ghost image,
+                resources=[cfg_base_image_repository_arn],
                 )
         )
         
@@ -134,12 +239,48 @@ class FeBuildDeploy(Stack):
                 "s3:ListBucket",
                 "s3:DeleteObject"
             ],
-            resources=[] # Add the ARN of the S3 bucket that the buildspec file is located
+            resources=[cfg_buildspec_bucket_arn, f"{cfg_buildspec_bucket_arn}/*"],
             )
         )
 
 
 
+        buildproject.add_to_role_policy(iam.PolicyStatement(
+            effect=iam.Effect.ALLOW,
+            actions=[
+                "ecr:DescribeImages"
+            ],
+            resources=[
+                f'arn:aws:ecr:{region}:{cfg_account_id}:repository/{cfg_app_name}'
+                for region in [cfg_region] + cfg_replication_regions
+            ],
+            )
+        )
+
+        # The blue/green task definitions are rendered from the latest revision of the family
+        if cfg_blue_green:
+            buildproject.add_to_role_policy(iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "ecs:DescribeTaskDefinition"
+                ],
+                resources=["*"],
+                )
+            )
+
+        # Report group created on the first build for the build-timings report of the buildspec
+        buildproject.add_to_role_policy(iam.PolicyStatement(
+            effect=iam.Effect.ALLOW,
+            actions=[
+                "codebuild:CreateReportGroup",
+                "codebuild:CreateReport",
+                "codebuild:UpdateReport",
+                "codebuild:BatchPutTestCases"
+            ],
+            resources=[f'arn:aws:codebuild:{cfg_region}:{cfg_account_id}:report-group/{buildproject.project_name}-*'],
+            )
+        )
+
         buildproject.add_to_role_policy(
                 iam.PolicyStatement(
                 effect=iam.Effect.ALLOW,
@@ -163,6 +304,8 @@ class FeBuildDeploy(Stack):
             ),
             branch=cfg_branch,
             output=source_output,
+            # The pipeline is started by the forwarded event rule below, not by a rule of the action
+            trigger=aws_codepipeline_actions.CodeCommitTrigger.NONE,
             role=iam.Role.from_role_arn(
                 self, "addrole",
                 role_arn=f'{cfg_service_account_role}') 
@@ -191,7 +334,8 @@ class FeBuildDeploy(Stack):
 
         pipeline = codepipeline.Pipeline(
             self, f"pipeline-{cfg_app_name}",
-            restart_execution_on_update=True,
+            pipeline_type=codepipeline.PipelineType.V2,
+            execution_mode=codepipeline.ExecutionMode[cfg_execution_mode],
             artifact_bucket=cross_account_artifacts_bucket
         )
 
@@ -248,27 +392,147 @@ class FeBuildDeploy(Stack):
             f"SG for {cfg_app_name} container in ECS"
         )
 
-        deploy_action = aws_codepipeline_actions.EcsDeployAction(
-            action_name=f"deploy-to-ecs",
-            service=ecs.FargateService.from_fargate_service_attributes(
-                            self, "fargateservicefromname",
-                            service_name=cfg_ecs_service_name,
-                            cluster=ecs.Cluster.from_cluster_attributes(
-                                self, "ecsclusterfromname",
-                                cluster_name=cfg_ecs_cluster_name,
-                                vpc=vpc,
-                                security_groups=[sg]
-                            )
+        if cfg_blue_green:
+            # CodeDeploy shifts the traffic in steps and rolls back on the alarms of the infra stack, the build
+            # writes the task definition and the appspec that names the load balancer target
+            deploy_action = aws_codepipeline_actions.CodeDeployEcsDeployAction(
+                action_name="deploy-to-ecs",
+                deployment_group=codedeploy.EcsDeploymentGroup.from_ecs_deployment_group_attributes(
+                    self, "deploymentgroupfromname",
+                    application=codedeploy.EcsApplication.from_ecs_application_name(
+                        self, "deployapplicationfromname",
+                        ecs_application_name=cfg_app_name
                     ),
-            input=build_output,
-            deployment_timeout=Duration.minutes(18)
-        )
+                    deployment_group_name=cfg_app_name
+                ),
+                task_definition_template_file=build_output.at_path(f"taskdef-{cfg_region}.json"),
+                app_spec_template_file=build_output.at_path("appspec.yaml")
+            )
+        else:
+            deploy_action = aws_codepipeline_actions.EcsDeployAction(
+                action_name=f"deploy-to-ecs",
+                service=ecs.FargateService.from_fargate_service_attributes(
+                                self, "fargateservicefromname",
+                                service_name=cfg_ecs_service_name,
+                                cluster=ecs.Cluster.from_cluster_attributes(
+                                    self, "ecsclusterfromname",
+                                    cluster_name=cfg_ecs_cluster_name,
+                                    vpc=vpc,
+                                    security_groups=[sg]
+                                )
+                        ),
+                input=build_output,
+                deployment_timeout=Duration.minutes(cfg_deployment_timeout)
+            )
 
 
-        pipeline.add_stage(
-            stage_name="deploy",
-            actions=[deploy_action]
-        )
+        # The services of the additional regions pull the replicated image of their own region
+        regional_deploy_actions = [
+            aws_codepipeline_actions.EcsDeployAction(
+                action_name=f"deploy-to-ecs-{region['region']}",
+                service=ecs.FargateService.from_fargate_service_attributes(
+                                self, f"fargateservice-{region['region']}",
+                                service_arn=f"arn:aws:ecs:{region['region']}:{cfg_account_id}:service/{cfg_ecs_cluster_name}/{cfg_app_name}",
+                                cluster=ecs.Cluster.from_cluster_attributes(
+                                    self, f"ecscluster-{region['region']}",
+                                    cluster_name=cfg_ecs_cluster_name,
+                                    vpc=ec2.Vpc.from_vpc_attributes(
+                                        self, f"vpc-{region['region']}",
+                                        vpc_id=region['vpcId'],
+                                        availability_zones=[
+                                            f"{region['region']}{zone}"
+                                            for zone in region.get('availability_zones') or config['acc'].get('availability_zones') or ["a", "b", "c"]
+                                        ]
+                                    )
+                                )
+                        ),
+                image_file=build_output.at_path(f"imagedefinitions-{region['region']}.json"),
+                deployment_timeout=Duration.minutes(cfg_deployment_timeout)
+            ) for region in cfg_regions
+        ]
+
+        # With blue/green the additional regions keep rolling updates, they start once the
+        # main region has shifted all of its traffic without a rollback
+        if cfg_blue_green and regional_deploy_actions:
+            pipeline.add_stage(
+                stage_name="deploy",
+                actions=[deploy_action]
+            )
+
+            pipeline.add_stage(
+                stage_name="deploy-regions",
+                actions=regional_deploy_actions
+            )
+        else:
+            pipeline.add_stage(
+                stage_name="deploy",
+                actions=[deploy_action] + regional_deploy_actions
+            )
+
+        # Requests the sitemap URLs after the deploy, so the first readers do not hit cold Ghost and edge caches
+        if cfg_cache_warmer:
+            cache_warmer_script = s3_assets.Asset(
+                self, "cachewarmerscript",
+                path=os.path.join(os.path.dirname(__file__), "..", "cache-warmer", "warm.py")
+            )
+
+            cache_warmer_project = codebuild.PipelineProject(
+                self, "cachewarmerproject",
+                project_name=f"{cfg_app_name}-cache-warmer",
+                build_spec=codebuild.BuildSpec.from_object({
+                    "version": "0.2",
+                    "phases": {
+                        "install": {
+                            "runtime-versions": {"python": "3.12"}
+                        },
+                        "build": {
+                            "commands": [
+                                "aws s3 cp $WARMER_SCRIPT_URL warm.py",
+                                "python3 warm.py"
+                            ]
+                        }
+                    },
+                    "artifacts": {
+                        "files": ["cache-warmer-report.json"]
+                    }
+                }),
+                environment=codebuild.BuildEnvironment(
+                    build_image=codebuild.LinuxBuildImage.STANDARD_7_0,
+                    compute_type=codebuild.ComputeType.SMALL
+                ),
+                environment_variables={
+                    'WARMER_SCRIPT_URL': codebuild.BuildEnvironmentVariable(
+                        value=cache_warmer_script.s3_object_url),
+                    'SITE_URL': codebuild.BuildEnvironmentVariable(
+                        value=cfg_cache_warmer['site_url']),
+                    'URL_BUDGET': codebuild.BuildEnvironmentVariable(
+                        value=f"{cfg_cache_warmer['url_budget']}"),
+                    'CONCURRENCY': codebuild.BuildEnvironmentVariable(
+                        value=f"{cfg_cache_warmer['concurrency']}"),
+                    'IMAGE_SIZES': codebuild.BuildEnvironmentVariable(
+                        value=" ".join(f"{size}" for size in cfg_cache_warmer.get('image_sizes') or [])),
+                },
+                description=f'Warm the caches of {cfg_app_name} after a deploy',
+                vpc=vpc
+            )
+
+            cache_warmer_script.grant_read(cache_warmer_project)
+            PerformancePolicy.suppress(
+                cache_warmer_project, "codebuild-cache",
+                "Runs a single Python script, there is no docker build or dependency install to cache"
+            )
+
+            pipeline.add_stage(
+                stage_name="warm-cache",
+                actions=[
+                    aws_codepipeline_actions.CodeBuildAction(
+                        action_name="warm-cache",
+                        project=cache_warmer_project,
+                        input=source_output,
+                        outputs=[codepipeline.Artifact(artifact_name='cachewarmerreport')]
+                    )
+                ]
+            )
 
 
         event_pattern = events.EventPattern(
@@ -290,10 +554,50 @@ class FeBuildDeploy(Stack):
             } 
         )
 
-        target=aws_events_targets.CodePipeline(
+        target = aws_events_targets.CodePipeline(
                 pipeline
                 )
 
+        # Pushes that only touch excluded paths, e.g. docs or infra code, do not start the pipeline
+        if cfg_trigger_paths:
+            trigger_function = _lambda.Function(
+                self, "pipelinetrigger",
+                description=f"Start the {cfg_app_name} pipeline when a push changes the app code",
+                runtime=_lambda.Runtime.PYTHON_3_12,
+                handler="index.handler",
+                code=_lambda.Code.from_asset(
+                    os.path.join(os.path.dirname(__file__), "..", "pipeline-trigger")
+                ),
+                timeout=Duration.seconds(30),
+                environment={
+                    "PIPELINE_NAME": pipeline.pipeline_name,
+                    "REPOSITORY_NAME": cfg_repo,
+                    "SOURCE_ROLE_ARN": cfg_service_account_role,
+                    "INCLUDE_PATHS": json.dumps(cfg_trigger_paths.get('include') or ["*"]),
+                    "EXCLUDE_PATHS": json.dumps(cfg_trigger_paths.get('exclude') or [])
+                }
+            )
+
+            trigger_function.add_to_role_policy(iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "codepipeline:StartPipelineExecution"
+                ],
+                resources=[pipeline.pipeline_arn],
+                )
+            )
+
+            trigger_function.add_to_role_policy(iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "sts:AssumeRole"
+                ],
+                resources=[f'{cfg_service_account_role}'],
+                )
+            )
+
+            target = aws_events_targets.LambdaFunction(trigger_function)
+
         event_rule = events.Rule(
             self, "eventrule",
             enabled=True,
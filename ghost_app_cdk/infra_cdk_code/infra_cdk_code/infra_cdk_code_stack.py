@@ -1,14 +1,33 @@
+import os
+
 from aws_cdk import (
-    Stack, RemovalPolicy, Duration, CfnOutput,
+    Stack, RemovalPolicy, Duration, CfnOutput, Size,
     aws_ec2 as ec2,
     aws_ecs as ecs,
     aws_iam as iam,
     aws_logs as logs,
     aws_elasticloadbalancingv2 as elbv2,
+    aws_applicationautoscaling as appscaling,
+    aws_s3 as s3,
+    aws_s3_assets as s3_assets,
+    aws_route53 as route53,
+    aws_route53_targets as route53_targets,
+    aws_ssm as ssm,
     Duration as Duration
 )
 from constructs import Construct
 
+from infra_cdk_code.cdn_distribution import CdnDistribution
+from infra_cdk_code.database import GhostDatabase
+from infra_cdk_code.cache import GhostCache
+from infra_cdk_code.monitoring import GhostMonitoring
+from infra_cdk_code.media_storage import GhostMediaStorage
+from infra_cdk_code.blue_green import GhostBlueGreen
+from infra_cdk_code.config_model import service_name_parameter
+
+# Load balancer types of lb.mode
+LB_MODES = ["nlb", "alb"]
+
 class CdkCodeStack(Stack):
 
     def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
@@ -17,6 +36,9 @@ class CdkCodeStack(Stack):
 
 
         cfg_account_id = config['acc']['accountId']
+        cfg_region = config['acc']['region']
+        cfg_env = config['acc']['env']
+        cfg_availability_zones = [f"{cfg_region}{zone}" for zone in config['acc'].get('availability_zones') or ["a", "b", "c"]]
         cfg_vpcid = config['acc']['resources']['vpcId']
 
         cfg_fe_name = config['fe']['code']['name']
@@ -25,12 +47,35 @@ class CdkCodeStack(Stack):
         cfg_fe_td_mem = config['fe']['ecs']['td_memory']
         cfg_fe_con_cpu = config['fe']['ecs']['container_cpu']
         cfg_fe_con_mem = config['fe']['ecs']['container_memory']
+        cfg_fe_node_heap = config['fe']['ecs'].get('node_max_old_space_size')
         cfg_fe_con_port = config['fe']['ecs']['container_port']
         cfg_fe_host_port = config['fe']['ecs']['host_port']
         cfg_ecs_cluster_name = config['fe']['ecs']['cluster_name']
+        # Only set by app.regional_config, the service of the main region keeps its generated name
+        cfg_ecs_service_name = config['fe']['ecs'].get('service_name')
+        cfg_fe_cpu_architecture = config['fe']['ecs'].get('cpu_architecture') or "X86_64"
+        cfg_fe_assign_public_ip = config['fe']['ecs'].get('assign_public_ip', True)
+        cfg_fe_vpc_endpoints = config['fe']['ecs'].get('vpc_endpoints', False)
+        cfg_fe_autoscaling = config['fe']['ecs'].get('autoscaling')
+        cfg_fe_deployment = config['fe']['ecs']['deployment']
+        cfg_fe_container_health_check = cfg_fe_deployment['container_health_check']
+        cfg_fe_target_health_check = cfg_fe_deployment['target_health_check']
+        cfg_fe_blue_green = cfg_fe_deployment.get('blue_green')
 
         cfg_fe_target_port = config['fe']['lb']['targer_port']
         cfg_fe_listener_certificate_arn = config['fe']['lb']['certificate_arn']
+        cfg_fe_lb_mode = config['fe']['lb'].get('mode') or "nlb"
+        cfg_fe_internet_facing = config['fe']['lb'].get('internet_facing', False)
+        cfg_fe_dns = config['fe'].get('dns')
+        cfg_fe_cdn = config['fe'].get('cdn')
+        cfg_fe_database = config['fe'].get('database')
+        cfg_fe_cache = config['fe'].get('cache')
+        cfg_fe_media = config['fe'].get('media')
+        cfg_fe_monitoring = config['fe'].get('monitoring')
+        cfg_fe_tracing = config['fe'].get('tracing')
+        cfg_fe_nginx = config['fe'].get('nginx')
+        cfg_fe_logging = config['fe'].get('logging') or {}
+        cfg_fe_log_driver = cfg_fe_logging.get('driver') or "awslogs"
 
         vpc = ec2.Vpc.from_lookup(
             self, "vpc",
@@ -38,6 +83,10 @@ class CdkCodeStack(Stack):
             is_default=False
         )
 
+        vpc_subnets = ec2.SubnetSelection(
+            availability_zones=cfg_availability_zones
+        )
+
         fs_security_group = ec2.SecurityGroup(
             self, "fssg",
             allow_all_outbound=True,
@@ -50,6 +99,26 @@ class CdkCodeStack(Stack):
             f"SG for {cfg_fe_name} container in ECS"
         )
 
+        # Keep image pulls and log delivery of the tasks on the AWS network
+        if cfg_fe_vpc_endpoints:
+            vpc.add_gateway_endpoint(
+                "s3endpoint",
+                service=ec2.GatewayVpcEndpointAwsService.S3,
+                subnets=[vpc_subnets]
+            )
+
+            for endpoint_id, endpoint_service in {
+                "ecrapiendpoint": ec2.InterfaceVpcEndpointAwsService.ECR,
+                "ecrdkrendpoint": ec2.InterfaceVpcEndpointAwsService.ECR_DOCKER,
+                "logsendpoint": ec2.InterfaceVpcEndpointAwsService.CLOUDWATCH_LOGS
+            }.items():
+                vpc.add_interface_endpoint(
+                    endpoint_id,
+                    service=endpoint_service,
+                    subnets=vpc_subnets,
+                    private_dns_enabled=True
+                )
+
         cluster = ecs.Cluster.from_cluster_attributes(
             self, "ecscluster",
             cluster_name = cfg_ecs_cluster_name,
@@ -62,6 +131,21 @@ class CdkCodeStack(Stack):
                 role_arn=f"arn:aws:iam::{cfg_account_id}:role/ecsTaskExecutionRole"
                 )
 
+        # The FireLens, tracing and nginx sidecars reserve their CPU/memory next to the Ghost container,
+        # together they must fit in the task size
+        sidecar_reservations = []
+        if cfg_fe_log_driver == "firelens":
+            sidecar_reservations.append((cfg_fe_logging['firelens']['cpu'], cfg_fe_logging['firelens']['memory']))
+        if cfg_fe_tracing:
+            sidecar_reservations.append((cfg_fe_tracing['collector_cpu'], cfg_fe_tracing['collector_memory']))
+        if cfg_fe_nginx:
+            sidecar_reservations.append((cfg_fe_nginx['cpu'], cfg_fe_nginx['memory']))
+        if cfg_fe_con_cpu + sum(cpu for cpu, _ in sidecar_reservations) > int(cfg_fe_td_cpu) or \
+                cfg_fe_con_mem + sum(memory for _, memory in sidecar_reservations) > int(cfg_fe_td_mem):
+            raise RuntimeError(
+                f"The {cfg_fe_name} container and its sidecars need more CPU/memory than the task definition has"
+            )
+
         task_definition = ecs.TaskDefinition(
             self, "td",
             compatibility=ecs.Compatibility.FARGATE,
@@ -69,73 +153,744 @@ class CdkCodeStack(Stack):
             network_mode=ecs.NetworkMode.AWS_VPC,
             cpu=f"{cfg_fe_td_cpu}",
             memory_mib=f"{cfg_fe_td_mem}",
+            runtime_platform=ecs.RuntimePlatform(
+                cpu_architecture=getattr(ecs.CpuArchitecture, cfg_fe_cpu_architecture),
+                operating_system_family=ecs.OperatingSystemFamily.LINUX
+            ),
             execution_role=ecsExecutionRole,
             task_role=ecsExecutionRole         
         )
 
-        container_log_driver = ecs.LogDriver.aws_logs(
+        cfg_fe_log_retention = None
+        if cfg_fe_logging.get('retention'):
+            cfg_fe_log_retention = cfg_fe_logging['retention'].get(cfg_env)
+            if not cfg_fe_log_retention:
+                raise RuntimeError(f"logging.retention of {cfg_fe_name} has no value for the env {cfg_env}")
+
+        log_group = logs.LogGroup(
+            self, "loggroup",
+            retention=logs.RetentionDays[cfg_fe_log_retention] if cfg_fe_log_retention else None
+        )
+
+        # Non blocking mode drops log lines when the buffer is full instead of stalling Ghost
+        awslogs_log_driver = ecs.LogDriver.aws_logs(
             stream_prefix="ecs",
-            log_group=logs.LogGroup(
-                self, "loggroup",
-            )
+            log_group=log_group,
+            mode=ecs.AwsLogDriverMode.NON_BLOCKING if cfg_fe_logging.get('max_buffer_size') else None,
+            max_buffer_size=Size.mebibytes(cfg_fe_logging['max_buffer_size']) if cfg_fe_logging.get('max_buffer_size') else None
         )
 
+        container_log_driver = awslogs_log_driver
+
+        # Fluent Bit sidecar that filters, batches and ships the logs of the other containers
+        if cfg_fe_log_driver == "firelens":
+            cfg_fe_firelens = cfg_fe_logging['firelens']
+
+            log_router_environment = {
+                "AWS_REGION": self.region,
+                "LOG_EXCLUDE_PATTERN": cfg_fe_firelens['exclude_pattern']
+            }
+
+            fluent_bit_config_files = ["filter-access-logs.conf"]
+
+            if cfg_fe_firelens.get('s3_archive'):
+                log_archive_bucket = s3.Bucket(
+                    self, "logarchivebucket",
+                    encryption=s3.BucketEncryption.S3_MANAGED,
+                    block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+                    lifecycle_rules=[
+                        s3.LifecycleRule(
+                            expiration=Duration.days(cfg_fe_firelens['s3_archive']['expiration_days'])
+                        )
+                    ],
+                    removal_policy=RemovalPolicy.RETAIN
+                )
+                log_archive_bucket.grant_put(task_definition.task_role)
+
+                log_router_environment["LOG_ARCHIVE_BUCKET"] = log_archive_bucket.bucket_name
+                fluent_bit_config_files.append("s3-archive.conf")
+
+            # The init image of aws-for-fluent-bit loads extra config files from S3 on Fargate
+            for index, config_file in enumerate(fluent_bit_config_files, start=1):
+                config_asset = s3_assets.Asset(
+                    self, f"fluentbitconfig{index}",
+                    path=os.path.join(os.path.dirname(__file__), "..", "fluent-bit", config_file)
+                )
+                config_asset.grant_read(task_definition.task_role)
+                log_router_environment[f"aws_fluent_bit_init_s3_{index}"] = \
+                    f"arn:aws:s3:::{config_asset.s3_bucket_name}/{config_asset.s3_object_key}"
+
+            task_definition.add_firelens_log_router(
+                f"{cfg_fe_name}-log-router",
+                image=ecs.ContainerImage.from_registry(cfg_fe_firelens['image']),
+                firelens_config=ecs.FirelensConfig(
+                    type=ecs.FirelensLogRouterType.FLUENTBIT
+                ),
+                cpu=cfg_fe_firelens['cpu'],
+                memory_reservation_mib=cfg_fe_firelens['memory'],
+                environment=log_router_environment,
+                essential=True,
+                logging=awslogs_log_driver
+            )
+
+            log_group.grant_write(task_definition.task_role)
+
+            container_log_driver = ecs.LogDrivers.firelens(
+                options={
+                    "Name": "cloudwatch_logs",
+                    "region": self.region,
+                    "log_group_name": log_group.log_group_name,
+                    "log_stream_prefix": "ecs/",
+                    "auto_create_group": "false",
+                    "log-driver-buffer-limit": f"{cfg_fe_firelens['buffer_limit']}"
+                }
+            )
+
+
+        container_environment = {
+            "logging__level": cfg_fe_logging.get('ghost_log_level') or "info"
+        }
+        container_secrets = {}
+
+        # Without a database Ghost falls back to SQLite inside the container
+        if cfg_fe_database:
+            database = GhostDatabase(
+                self, "database",
+                vpc=vpc,
+                vpc_subnets=vpc_subnets,
+                client_security_group=fs_security_group,
+                config=config
+            )
+            container_environment.update(database.container_environment)
+            container_secrets.update(database.container_secrets)
 
-        task_definition.add_container(
+        # Without a shared cache every task keeps its own in process caches
+        if cfg_fe_cache:
+            cache = GhostCache(
+                self, "cache",
+                vpc=vpc,
+                vpc_subnets=vpc_subnets,
+                client_security_group=fs_security_group,
+                config=config
+            )
+            container_environment.update(cache.container_environment)
+
+        # Without S3 storage uploads stay on the task storage, they are lost when a task is replaced
+        media = None
+        if cfg_fe_media:
+            if cfg_fe_media.get('resize') and not cfg_fe_cdn:
+                raise RuntimeError(
+                    f"The image resize service of {cfg_fe_name} is an origin of the CloudFront distribution, it needs the cdn block"
+                )
+
+            media = GhostMediaStorage(
+                self, "media",
+                task_role=task_definition.task_role,
+                config=config
+            )
+            container_environment.update(media.container_environment)
+
+        # Tracing sidecar, its reservations come out of the task size next to the Ghost container
+        if cfg_fe_tracing:
+            task_definition.add_container(
+                f"{cfg_fe_name}-otel-collector",
+                image=ecs.ContainerImage.from_registry(cfg_fe_tracing['collector_image']),
+                cpu=cfg_fe_tracing['collector_cpu'],
+                memory_limit_mib=cfg_fe_tracing['collector_memory'],
+                command=["--config=/etc/ecs/ecs-default-config.yaml"],
+                essential=False,
+                logging=container_log_driver
+            )
+
+            task_definition.add_to_task_role_policy(iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "xray:PutTraceSegments",
+                    "xray:PutTelemetryRecords",
+                    "xray:GetSamplingRules",
+                    "xray:GetSamplingTargets",
+                    "xray:GetSamplingStatisticSummaries",
+                    "logs:CreateLogGroup",
+                    "logs:CreateLogStream",
+                    "logs:PutLogEvents",
+                    "logs:DescribeLogStreams"
+                ],
+                resources=["*"],
+                )
+            )
+
+            # Node auto instrumentation shipped in the image, see my-ghost-app/Dockerfile
+            container_environment.update({
+                "NODE_OPTIONS": "--require /opt/opentelemetry/node_modules/@opentelemetry/auto-instrumentations-node/build/src/register.js",
+                "OTEL_SERVICE_NAME": cfg_fe_name,
+                "OTEL_TRACES_EXPORTER": "otlp",
+                "OTEL_METRICS_EXPORTER": "none",
+                "OTEL_EXPORTER_OTLP_PROTOCOL": "http/protobuf",
+                "OTEL_EXPORTER_OTLP_ENDPOINT": "http://localhost:4318",
+                "OTEL_PROPAGATORS": "xray,tracecontext",
+                "OTEL_TRACES_SAMPLER": "parentbased_traceidratio",
+                "OTEL_TRACES_SAMPLER_ARG": f"{cfg_fe_tracing['sampling_rate']}",
+                "OTEL_NODE_ENABLED_INSTRUMENTATIONS": "http,express,mysql2,knex,fs"
+            })
+
+        # V8 heap limit of Ghost, it stays below container_memory so the native memory of node still fits
+        if cfg_fe_node_heap:
+            if int(cfg_fe_node_heap) >= int(cfg_fe_con_mem):
+                raise RuntimeError(
+                    f"The node_max_old_space_size of {cfg_fe_name} must be lower than its container_memory"
+                )
+            node_options = [f"--max-old-space-size={cfg_fe_node_heap}", container_environment.get("NODE_OPTIONS")]
+            container_environment["NODE_OPTIONS"] = " ".join(option for option in node_options if option)
+
+        ghost_container = task_definition.add_container(
             f"{cfg_fe_name}-container",
             image=ecs.ContainerImage.from_registry("amazon/amazon-ecs-sample"), # default image
             cpu=cfg_fe_con_cpu,
             memory_limit_mib=cfg_fe_con_mem,
-            logging=container_log_driver
-        ).add_port_mappings(ecs.PortMapping(container_port=cfg_fe_con_port, host_port=cfg_fe_host_port))
+            environment=container_environment,
+            secrets=container_secrets,
+            logging=container_log_driver,
+            # Ghost answers the site endpoint once the database migrations are done, the ghost image has no curl.
+            # The placeholder image of the first deployment has no node, so it is not checked
+            health_check=ecs.HealthCheck(
+                command=[
+                    "CMD-SHELL",
+                    "command -v node >/dev/null || exit 0; "
+                    f"node -e \"require('http').get('http://localhost:{cfg_fe_con_port}{cfg_fe_container_health_check['path']}', "
+                    "r => process.exit(r.statusCode < 400 ? 0 : 1)).on('error', () => process.exit(1))\""
+                ],
+                interval=Duration.seconds(cfg_fe_container_health_check['interval']),
+                timeout=Duration.seconds(cfg_fe_container_health_check['timeout']),
+                retries=cfg_fe_container_health_check['retries'],
+                start_period=Duration.seconds(cfg_fe_container_health_check['start_period'])
+            )
+        )
+        ghost_container.add_port_mappings(ecs.PortMapping(container_port=cfg_fe_con_port, host_port=cfg_fe_host_port))
 
+        # nginx sidecar in front of Ghost, it serves cached static assets and micro caches anonymous HTML
+        target_container = ghost_container
+        target_port = cfg_fe_con_port
+        if cfg_fe_nginx:
+            with open(os.path.join(os.path.dirname(__file__), "..", "nginx", "default.conf.template")) as template:
+                nginx_template = template.read()
+
+            nginx_container = task_definition.add_container(
+                f"{cfg_fe_name}-nginx",
+                image=ecs.ContainerImage.from_registry(cfg_fe_nginx['image']),
+                cpu=cfg_fe_nginx['cpu'],
+                memory_limit_mib=cfg_fe_nginx['memory'],
+                # The template is passed in the environment and rendered by the entrypoint of the nginx image
+                entry_point=["sh", "-c"],
+                command=[
+                    "mkdir -p /etc/nginx/templates && "
+                    "printf '%s' \"$NGINX_TEMPLATE\" > /etc/nginx/templates/default.conf.template && "
+                    "exec /docker-entrypoint.sh nginx -g 'daemon off;'"
+                ],
+                environment={
+                    "NGINX_TEMPLATE": nginx_template,
+                    "NGINX_PORT": f"{cfg_fe_nginx['port']}",
+                    "GHOST_PORT": f"{cfg_fe_con_port}",
+                    "UPSTREAM_KEEPALIVE": f"{cfg_fe_nginx['upstream_keepalive']}",
+                    "MICRO_CACHE_TTL": f"{cfg_fe_nginx['micro_cache_ttl']}",
+                    "STATIC_CACHE_TTL": f"{cfg_fe_nginx['static_cache_ttl']}",
+                    "STATIC_CACHE_SIZE": cfg_fe_nginx['static_cache_size'],
+                    "HTML_CACHE_SIZE": cfg_fe_nginx['html_cache_size']
+                },
+                logging=container_log_driver,
+                health_check=ecs.HealthCheck(
+                    command=["CMD-SHELL", f"wget -q -O /dev/null http://localhost:{cfg_fe_nginx['port']}/nginx-health || exit 1"],
+                    interval=Duration.seconds(cfg_fe_container_health_check['interval']),
+                    timeout=Duration.seconds(cfg_fe_container_health_check['timeout']),
+                    retries=cfg_fe_container_health_check['retries']
+                )
+            )
+            nginx_container.add_port_mappings(ecs.PortMapping(container_port=cfg_fe_nginx['port']))
+            nginx_container.add_container_dependencies(
+                ecs.ContainerDependency(
+                    container=ghost_container,
+                    condition=ecs.ContainerDependencyCondition.HEALTHY
+                )
+            )
+
+            fs_security_group.add_ingress_rule(
+                ec2.Peer.any_ipv4(),
+                ec2.Port.tcp(cfg_fe_nginx['port']),
+                f"SG for the nginx sidecar of {cfg_fe_name} in ECS"
+            )
+
+            target_container = nginx_container
+            target_port = cfg_fe_nginx['port']
 
 
+
+        if cfg_fe_lb_mode not in LB_MODES:
+            raise RuntimeError(f"Unknown lb mode {cfg_fe_lb_mode} of {cfg_fe_name}, choose from {', '.join(LB_MODES)}")
+
+        # The rollback alarms of a blue/green deployment watch response times, only the ALB publishes them
+        if cfg_fe_blue_green and cfg_fe_lb_mode != "alb":
+            raise RuntimeError(
+                f"The blue/green deployments of {cfg_fe_name} roll back on load balancer response times, they need lb mode alb"
+            )
+
         fargate_service = ecs.FargateService(
            self, "fs",
            cluster=cluster,
-           desired_count=0,
-           assign_public_ip=True,
-           vpc_subnets=ec2.SubnetSelection(
-               availability_zones=["eu-central-1c","eu-central-1b","eu-central-1a"]
-            ),
+           service_name=cfg_ecs_service_name,
+           # A scaled service leaves DesiredCount out of the template, so a stack update keeps the scaled task count
+           desired_count=None if cfg_fe_autoscaling else 0,
+           assign_public_ip=cfg_fe_assign_public_ip,
+           vpc_subnets=vpc_subnets,
             task_definition=task_definition,
-            security_groups=[fs_security_group]
+            security_groups=[fs_security_group],
+            min_healthy_percent=cfg_fe_deployment['min_healthy_percent'],
+            max_healthy_percent=cfg_fe_deployment['max_healthy_percent'],
+            health_check_grace_period=Duration.seconds(cfg_fe_deployment['health_check_grace_period']),
+            circuit_breaker=ecs.DeploymentCircuitBreaker(
+                enable=True,
+                rollback=True
+            ) if cfg_fe_deployment.get('circuit_breaker') and not cfg_fe_blue_green else None,
+            deployment_controller=ecs.DeploymentController(
+                type=ecs.DeploymentControllerType.CODE_DEPLOY
+            ) if cfg_fe_blue_green else None
         )
 
-        config['ecs_service_name'] = fargate_service.service_name
+        # ECS refuses task definition updates of a service that CodeDeploy deploys. The service points at the
+        # family instead, new revisions of this stack are rolled out by the pipeline, which starts from the latest one
+        if cfg_fe_blue_green:
+            fargate_service.node.default_child.add_property_override("TaskDefinition", task_definition.family)
+            fargate_service.node.add_dependency(task_definition)
+
+        # A new service name would replace the running service, so the generated name is published for the
+        # pipeline and the CLIs instead
+        ssm.StringParameter(
+            self, "servicenameparameter",
+            parameter_name=service_name_parameter(config['acc'], config['fe']),
+            description=f"Name of the ECS service of {cfg_fe_name}",
+            string_value=fargate_service.service_name
+        )
 
+        # The pipeline stack now reads the service name from SSM, the export it imported before stays
+        # until the pipeline stacks of all accounts are updated, otherwise the infra stack update fails
+        self.export_value(fargate_service.service_name)
 
-        load_balancer = elbv2.NetworkLoadBalancer(
-           self,"network-load-balancer", 
-           vpc=vpc,
-           vpc_subnets=ec2.SubnetSelection(
-               availability_zones=["eu-central-1c","eu-central-1b","eu-central-1a"]
-           )
+        # Sidecars are added before the Ghost container, so the load balancer target is named explicitly
+        service_target = fargate_service.load_balancer_target(
+            container_name=target_container.container_name,
+            container_port=target_port
         )
 
+
         certificate = elbv2.ListenerCertificate.from_arn(
             certificate_arn=cfg_fe_listener_certificate_arn
         )
 
-        tls_listener = elbv2.NetworkListener(
-            self, "tlsListener",
-            load_balancer=load_balancer,
-            certificates=[certificate],
-            port=cfg_fe_target_port
-        )
+        if cfg_fe_lb_mode == "alb":
+            cfg_fe_alb = config['fe']['lb']['alb']
 
+            load_balancer = elbv2.ApplicationLoadBalancer(
+               self, "application-load-balancer",
+               vpc=vpc,
+               internet_facing=cfg_fe_internet_facing,
+               vpc_subnets=vpc_subnets,
+               http2_enabled=True,
+               idle_timeout=Duration.seconds(cfg_fe_alb['idle_timeout']),
+               client_keep_alive=Duration.seconds(cfg_fe_alb['client_keep_alive'])
+            )
 
-        tls_listener.add_targets(
-            "ECS1",
-            port=cfg_fe_host_port,
-            targets=[fargate_service],
-            protocol=elbv2.Protocol.TCP,
-            deregistration_delay=Duration.seconds(60)
-        )
+            https_listener = load_balancer.add_listener(
+                "httpsListener",
+                protocol=elbv2.ApplicationProtocol.HTTPS,
+                certificates=[certificate],
+                port=cfg_fe_target_port
+            )
+
+            # Request level balancing keeps slow admin requests from piling up on one task
+            target_group_settings = dict(
+                port=cfg_fe_host_port,
+                protocol=elbv2.ApplicationProtocol.HTTP,
+                load_balancing_algorithm_type=elbv2.TargetGroupLoadBalancingAlgorithmType.LEAST_OUTSTANDING_REQUESTS,
+                slow_start=Duration.seconds(cfg_fe_alb['slow_start']),
+                deregistration_delay=Duration.seconds(cfg_fe_deployment['deregistration_delay']),
+                health_check=elbv2.HealthCheck(
+                    path=cfg_fe_alb['health_check_path'],
+                    healthy_http_codes="200",
+                    interval=Duration.seconds(cfg_fe_target_health_check['interval']),
+                    timeout=Duration.seconds(cfg_fe_target_health_check['timeout']),
+                    healthy_threshold_count=cfg_fe_target_health_check['healthy_threshold'],
+                    unhealthy_threshold_count=cfg_fe_target_health_check['unhealthy_threshold']
+                )
+            )
+
+            target_group = https_listener.add_targets(
+                "ECS1",
+                targets=[service_target],
+                **target_group_settings
+            )
+
+            # Second target group and test listener of the blue/green deployments, CodeDeploy starts the
+            # new tasks behind the test listener and then shifts the production listener step by step
+            if cfg_fe_blue_green:
+                green_target_group = elbv2.ApplicationTargetGroup(
+                    self, "ECS2",
+                    vpc=vpc,
+                    target_type=elbv2.TargetType.IP,
+                    **target_group_settings
+                )
+
+                test_listener = load_balancer.add_listener(
+                    "testListener",
+                    protocol=elbv2.ApplicationProtocol.HTTPS,
+                    certificates=[certificate],
+                    port=cfg_fe_blue_green['test_listener_port'],
+                    default_target_groups=[green_target_group],
+                    open=False
+                )
+                test_listener.connections.allow_default_port_from(
+                    ec2.Peer.ipv4(vpc.vpc_cidr_block),
+                    f"Test listener of the {cfg_fe_name} blue/green deployments"
+                )
+
+                GhostBlueGreen(
+                    self, "bluegreen",
+                    fargate_service=fargate_service,
+                    load_balancer=load_balancer,
+                    listener=https_listener,
+                    test_listener=test_listener,
+                    blue_target_group=target_group,
+                    green_target_group=green_target_group,
+                    config=config
+                )
+        else:
+            load_balancer = elbv2.NetworkLoadBalancer(
+               self,"network-load-balancer", 
+               vpc=vpc,
+               internet_facing=cfg_fe_internet_facing,
+               vpc_subnets=vpc_subnets
+            )
+
+            tls_listener = elbv2.NetworkListener(
+                self, "tlsListener",
+                load_balancer=load_balancer,
+                certificates=[certificate],
+                port=cfg_fe_target_port
+            )
+
+
+            target_group = tls_listener.add_targets(
+                "ECS1",
+                port=cfg_fe_host_port,
+                targets=[service_target],
+                protocol=elbv2.Protocol.TCP,
+                deregistration_delay=Duration.seconds(cfg_fe_deployment['deregistration_delay']),
+                health_check=elbv2.HealthCheck(
+                    protocol=elbv2.Protocol.TCP,
+                    interval=Duration.seconds(cfg_fe_target_health_check['interval']),
+                    healthy_threshold_count=cfg_fe_target_health_check['healthy_threshold'],
+                    unhealthy_threshold_count=cfg_fe_target_health_check['unhealthy_threshold']
+                )
+            )
+
+        # Autoscaling
+        if cfg_fe_autoscaling:
+            scale_in_cooldown = Duration.seconds(cfg_fe_autoscaling['scale_in_cooldown'])
+            scale_out_cooldown = Duration.seconds(cfg_fe_autoscaling['scale_out_cooldown'])
+
+            scalable_target = fargate_service.auto_scale_task_count(
+                min_capacity=cfg_fe_autoscaling['min_capacity'],
+                max_capacity=cfg_fe_autoscaling['max_capacity']
+            )
+            # The metric math policies below are only available as CfnScalingPolicy, they attach to the same target
+            scalable_target_id = scalable_target.node.find_child("Target").scalable_target_id
+
+            if cfg_fe_autoscaling.get('cpu_target'):
+                scalable_target.scale_on_cpu_utilization(
+                    "cpu-target-tracking",
+                    target_utilization_percent=cfg_fe_autoscaling['cpu_target'],
+                    scale_in_cooldown=scale_in_cooldown,
+                    scale_out_cooldown=scale_out_cooldown
+                )
+
+            if cfg_fe_autoscaling.get('memory_target'):
+                scalable_target.scale_on_memory_utilization(
+                    "memory-target-tracking",
+                    target_utilization_percent=cfg_fe_autoscaling['memory_target'],
+                    scale_in_cooldown=scale_in_cooldown,
+                    scale_out_cooldown=scale_out_cooldown
+                )
+
+            # The ALB publishes the requests per target of the target group
+            if cfg_fe_lb_mode == "alb" and cfg_fe_autoscaling.get('requests_per_task_target') and not cfg_fe_blue_green:
+                scalable_target.scale_on_request_count(
+                    "requests-target-tracking",
+                    requests_per_target=cfg_fe_autoscaling['requests_per_task_target'],
+                    target_group=target_group,
+                    scale_in_cooldown=scale_in_cooldown,
+                    scale_out_cooldown=scale_out_cooldown
+                )
+
+            # Blue/green deployments swap the target group that gets the traffic, so the requests of the load
+            # balancer are divided by the healthy tasks of both target groups
+            if cfg_fe_lb_mode == "alb" and cfg_fe_autoscaling.get('requests_per_task_target') and cfg_fe_blue_green:
+                request_queries = [
+                    appscaling.CfnScalingPolicy.TargetTrackingMetricDataQueryProperty(
+                        id="requests",
+                        metric_stat=appscaling.CfnScalingPolicy.TargetTrackingMetricStatProperty(
+                            metric=appscaling.CfnScalingPolicy.TargetTrackingMetricProperty(
+                                namespace="AWS/ApplicationELB",
+                                metric_name="RequestCount",
+                                dimensions=[
+                                    appscaling.CfnScalingPolicy.TargetTrackingMetricDimensionProperty(
+                                        name="LoadBalancer",
+                                        value=load_balancer.load_balancer_full_name
+                                    )
+                                ]
+                            ),
+                            stat="Sum"
+                        ),
+                        return_data=False
+                    )
+                ] + [
+                    appscaling.CfnScalingPolicy.TargetTrackingMetricDataQueryProperty(
+                        id=f"{color}hosts",
+                        metric_stat=appscaling.CfnScalingPolicy.TargetTrackingMetricStatProperty(
+                            metric=appscaling.CfnScalingPolicy.TargetTrackingMetricProperty(
+                                namespace="AWS/ApplicationELB",
+                                metric_name="HealthyHostCount",
+                                dimensions=[
+                                    appscaling.CfnScalingPolicy.TargetTrackingMetricDimensionProperty(
+                                        name="LoadBalancer",
+                                        value=load_balancer.load_balancer_full_name
+                                    ),
+                                    appscaling.CfnScalingPolicy.TargetTrackingMetricDimensionProperty(
+                                        name="TargetGroup",
+                                        value=color_target_group.target_group_full_name
+                                    )
+                                ]
+                            ),
+                            stat="Average"
+                        ),
+                        return_data=False
+                    ) for color, color_target_group in [("blue", target_group), ("green", green_target_group)]
+                ]
+
+                appscaling.CfnScalingPolicy(
+                    self, "requests-target-tracking",
+                    policy_name=f"{cfg_fe_name}-requests-per-task",
+                    policy_type="TargetTrackingScaling",
+                    scaling_target_id=scalable_target_id,
+                    target_tracking_scaling_policy_configuration=appscaling.CfnScalingPolicy.TargetTrackingScalingPolicyConfigurationProperty(
+                        target_value=cfg_fe_autoscaling['requests_per_task_target'],
+                        scale_in_cooldown=cfg_fe_autoscaling['scale_in_cooldown'],
+                        scale_out_cooldown=cfg_fe_autoscaling['scale_out_cooldown'],
+                        customized_metric_specification=appscaling.CfnScalingPolicy.CustomizedMetricSpecificationProperty(
+                            metrics=request_queries + [
+                                # The idle target group publishes no datapoints, without healthy tasks the
+                                # requests count against a single task so the service still scales out
+                                appscaling.CfnScalingPolicy.TargetTrackingMetricDataQueryProperty(
+                                    id="hosts",
+                                    expression="FILL(bluehosts, 0) + FILL(greenhosts, 0)",
+                                    return_data=False
+                                ),
+                                appscaling.CfnScalingPolicy.TargetTrackingMetricDataQueryProperty(
+                                    id="requestspertask",
+                                    expression="requests / IF(hosts > 0, hosts, 1)",
+                                    label="Requests per healthy task",
+                                    return_data=True
+                                )
+                            ]
+                        )
+                    )
+                )
+
+            # The NLB only publishes flow counts per target group, so the per task value
+            # is computed with metric math (active flows / healthy targets)
+            if cfg_fe_lb_mode == "nlb" and cfg_fe_autoscaling.get('flows_per_task_target'):
+                nlb_dimensions = [
+                    appscaling.CfnScalingPolicy.TargetTrackingMetricDimensionProperty(
+                        name="LoadBalancer",
+                        value=load_balancer.load_balancer_full_name
+                    ),
+                    appscaling.CfnScalingPolicy.TargetTrackingMetricDimensionProperty(
+                        name="TargetGroup",
+                        value=target_group.target_group_full_name
+                    )
+                ]
+
+                appscaling.CfnScalingPolicy(
+                    self, "flows-target-tracking",
+                    policy_name=f"{cfg_fe_name}-flows-per-task",
+                    policy_type="TargetTrackingScaling",
+                    scaling_target_id=scalable_target_id,
+                    target_tracking_scaling_policy_configuration=appscaling.CfnScalingPolicy.TargetTrackingScalingPolicyConfigurationProperty(
+                        target_value=cfg_fe_autoscaling['flows_per_task_target'],
+                        scale_in_cooldown=cfg_fe_autoscaling['scale_in_cooldown'],
+                        scale_out_cooldown=cfg_fe_autoscaling['scale_out_cooldown'],
+                        customized_metric_specification=appscaling.CfnScalingPolicy.CustomizedMetricSpecificationProperty(
+                            metrics=[
+                                appscaling.CfnScalingPolicy.TargetTrackingMetricDataQueryProperty(
+                                    id="flows",
+                                    metric_stat=appscaling.CfnScalingPolicy.TargetTrackingMetricStatProperty(
+                                        metric=appscaling.CfnScalingPolicy.TargetTrackingMetricProperty(
+                                            namespace="AWS/NetworkELB",
+                                            metric_name="ActiveFlowCount",
+                                            dimensions=nlb_dimensions
+                                        ),
+                                        stat="Average"
+                                    ),
+                                    return_data=False
+                                ),
+                                appscaling.CfnScalingPolicy.TargetTrackingMetricDataQueryProperty(
+                                    id="healthyhosts",
+                                    metric_stat=appscaling.CfnScalingPolicy.TargetTrackingMetricStatProperty(
+                                        metric=appscaling.CfnScalingPolicy.TargetTrackingMetricProperty(
+                                            namespace="AWS/NetworkELB",
+                                            metric_name="HealthyHostCount",
+                                            dimensions=nlb_dimensions
+                                        ),
+                                        stat="Average"
+                                    ),
+                                    return_data=False
+                                ),
+                                # A bad deploy or a cold start leaves no healthy tasks, the flows then count
+                                # against a single task so the service still scales out
+                                appscaling.CfnScalingPolicy.TargetTrackingMetricDataQueryProperty(
+                                    id="hosts",
+                                    expression="FILL(healthyhosts, 0)",
+                                    return_data=False
+                                ),
+                                appscaling.CfnScalingPolicy.TargetTrackingMetricDataQueryProperty(
+                                    id="flowspertask",
+                                    expression="flows / IF(hosts > 0, hosts, 1)",
+                                    label="Active flows per healthy task",
+                                    return_data=True
+                                )
+                            ]
+                        )
+                    )
+                )
+
+            # Step scaling reacts to sudden CPU spikes faster than target tracking
+            cfg_fe_step_scaling = cfg_fe_autoscaling.get('step_scaling')
+            if cfg_fe_step_scaling:
+                scalable_target.scale_on_metric(
+                    "cpu-step-scaling",
+                    metric=fargate_service.metric_cpu_utilization(
+                        period=Duration.minutes(1),
+                        statistic="Maximum"
+                    ),
+                    scaling_steps=[
+                        appscaling.ScalingInterval(
+                            lower=step.get('lower'),
+                            upper=step.get('upper'),
+                            change=step['change']
+                        ) for step in cfg_fe_step_scaling['steps']
+                    ],
+                    adjustment_type=appscaling.AdjustmentType.CHANGE_IN_CAPACITY,
+                    cooldown=Duration.seconds(cfg_fe_step_scaling['cooldown'])
+                )
+
+            for schedule in cfg_fe_autoscaling.get('schedules') or []:
+                scalable_target.scale_on_schedule(
+                    schedule['name'],
+                    schedule=appscaling.Schedule.expression(schedule['expression']),
+                    min_capacity=schedule.get('min_capacity'),
+                    max_capacity=schedule.get('max_capacity')
+                )
      
+        # Dashboard and alarms
+        if cfg_fe_monitoring:
+            monitoring = GhostMonitoring(
+                self, "monitoring",
+                cluster=cluster,
+                fargate_service=fargate_service,
+                load_balancer=load_balancer,
+                target_group=target_group,
+                config=config
+            )
+
+            CfnOutput(
+                self, "alarm_topic_arn",
+                description="sns topic of the performance alarms",
+                value=monitoring.topic.topic_arn
+            )
+
+        # Latency based record of this region, next to the records of the other regions
+        if cfg_fe_dns:
+            # The Route 53 health checkers connect from the internet, an internal load balancer fails every check
+            # and leaves the latency records without a healthy region
+            if not cfg_fe_internet_facing:
+                raise RuntimeError(
+                    f"The dns records of {cfg_fe_name} need an internet facing load balancer (lb.internet_facing)"
+                )
+
+            health_check = route53.CfnHealthCheck(
+                self, "healthcheck",
+                health_check_config=route53.CfnHealthCheck.HealthCheckConfigProperty(
+                    type="HTTPS",
+                    fully_qualified_domain_name=load_balancer.load_balancer_dns_name,
+                    port=cfg_fe_target_port,
+                    resource_path=cfg_fe_dns['health_check_path'],
+                    enable_sni=True,
+                    request_interval=cfg_fe_dns['health_check_interval'],
+                    failure_threshold=cfg_fe_dns['health_check_failure_threshold']
+                )
+            )
+
+            latency_record = route53.ARecord(
+                self, "latencyrecord",
+                zone=route53.HostedZone.from_hosted_zone_attributes(
+                    self, "hostedzone",
+                    hosted_zone_id=cfg_fe_dns['hosted_zone_id'],
+                    zone_name=cfg_fe_dns['zone_name']
+                ),
+                record_name=cfg_fe_dns['record_name'],
+                target=route53.RecordTarget.from_alias(
+                    route53_targets.LoadBalancerTarget(load_balancer)
+                ),
+                region=cfg_region,
+                set_identifier=f"{cfg_fe_name}-{cfg_region}"
+            )
+            latency_record.node.default_child.add_property_override("HealthCheckId", health_check.attr_health_check_id)
+
+        # Edge caching
+        if cfg_fe_cdn:
+            # CloudFront connects over HTTPS, so it needs the domain of the listener certificate, not the
+            # elb.amazonaws.com name, and it cannot reach an internal load balancer
+            if not cfg_fe_cdn.get('origin_domain') or not cfg_fe_internet_facing:
+                raise RuntimeError(
+                    f"The cdn of {cfg_fe_name} needs cdn.origin_domain and an internet facing load balancer (lb.internet_facing)"
+                )
+
+            cdn = CdnDistribution(
+                self, "cdn",
+                origin_domain_name=cfg_fe_cdn['origin_domain'],
+                origin_port=cfg_fe_target_port,
+                media=media,
+                config=config
+            )
+
+            CfnOutput(
+                self, "cdn_domain_name",
+                description="cloudfront distribution domain name",
+                value=cdn.distribution.distribution_domain_name
+            )
+
         # Output
            
+        if cfg_fe_database:
+            CfnOutput(
+                self, "db_proxy_endpoint",
+                description="rds proxy endpoint",
+                value=database.proxy.endpoint
+            )
+
+            if database.reader_endpoint:
+                CfnOutput(
+                    self, "db_proxy_reader_endpoint",
+                    description="rds proxy read only endpoint",
+                    value=database.reader_endpoint.attr_endpoint
+                )
+
         CfnOutput(
             self, "ecs_name",
             description="ecs cluster arn",
@@ -0,0 +1,71 @@
+import os
+
+from aws_cdk import (
+    Aws, Duration, Fn, RemovalPolicy, Stack,
+    aws_iam as iam,
+    aws_lambda as _lambda,
+    aws_s3 as s3
+)
+
+from constructs import Construct
+
+# Key prefix of the uploads, the same as the local content path so image URLs keep their /content/images/ paths
+MEDIA_PATH_PREFIX = "content/images"
+
+class GhostMediaStorage(Construct):
+
+    def __init__(self, scope: Construct, construct_id: str, *, task_role: iam.IRole, config: dict) -> None:
+        super().__init__(scope, construct_id)
+
+        cfg_fe_name = config['fe']['code']['name']
+        cfg_media = config['fe']['media']
+        cfg_media_resize = cfg_media.get('resize')
+
+        self.bucket = s3.Bucket(
+            self, "bucket",
+            encryption=s3.BucketEncryption.S3_MANAGED,
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            object_ownership=s3.ObjectOwnership.BUCKET_OWNER_ENFORCED,
+            enforce_ssl=True,
+            removal_policy=RemovalPolicy.RETAIN
+        )
+
+        self.bucket.grant_read_write(task_role)
+
+        # ghost-storage-adapter-s3, installed by my-ghost-app/Dockerfile, credentials come from the task role
+        self.container_environment = {
+            "storage__active": "s3",
+            "storage__s3__bucket": self.bucket.bucket_name,
+            "storage__s3__region": Stack.of(self).region,
+            "storage__s3__pathPrefix": MEDIA_PATH_PREFIX,
+            "storage__s3__assetHost": cfg_media['asset_host'],
+            "storage__s3__acl": "bucket-owner-full-control"
+        }
+
+        # Size variants are generated outside of the Ghost process, CloudFront routes /content/images/size/* here
+        self.resize_function_url = None
+        if cfg_media_resize:
+            # The stack UUID is not published anywhere, CloudFront sends it so the public URL cannot be used directly
+            self.origin_verify = Fn.select(2, Fn.split("/", Aws.STACK_ID))
+
+            resize_function = _lambda.DockerImageFunction(
+                self, "resizefunction",
+                description=f"Resized variants of the {cfg_fe_name} images",
+                code=_lambda.DockerImageCode.from_image_asset(
+                    os.path.join(os.path.dirname(__file__), "..", "image-resize")
+                ),
+                memory_size=cfg_media_resize['memory'],
+                timeout=Duration.seconds(30),
+                environment={
+                    "BUCKET": self.bucket.bucket_name,
+                    "ORIGIN_VERIFY": self.origin_verify,
+                    "WIDTHS": " ".join(f"{width}" for width in cfg_media_resize['widths']),
+                    "QUALITY": f"{cfg_media_resize['quality']}"
+                }
+            )
+
+            self.bucket.grant_read_write(resize_function)
+
+            self.resize_function_url = resize_function.add_function_url(
+                auth_type=_lambda.FunctionUrlAuthType.NONE
+            )
@@ -0,0 +1,322 @@
+from aws_cdk import (
+    Duration, Stack,
+    aws_cloudwatch as cloudwatch,
+    aws_cloudwatch_actions as cloudwatch_actions,
+    aws_ecs as ecs,
+    aws_elasticloadbalancingv2 as elbv2,
+    aws_sns as sns,
+    aws_sns_subscriptions as subscriptions,
+    custom_resources as cr
+)
+
+from constructs import Construct
+
+# CodeBuild phase metrics shown as the duration of the image build stage
+BUILD_DURATION_METRICS = [
+    "QueuedDuration",
+    "ProvisioningDuration",
+    "InstallDuration",
+    "BuildDuration",
+    "PostBuildDuration",
+    "Duration"
+]
+
+class GhostMonitoring(Construct):
+
+    def __init__(self, scope: Construct, construct_id: str, *, cluster: ecs.ICluster, fargate_service: ecs.FargateService,
+                 load_balancer: elbv2.BaseLoadBalancer, target_group: elbv2.TargetGroupBase, config: dict) -> None:
+        super().__init__(scope, construct_id)
+
+        cfg_fe_name = config['fe']['code']['name']
+        cfg_fe_lb_mode = config['fe']['lb'].get('mode') or "nlb"
+        cfg_monitoring = config['fe']['monitoring']
+        cfg_thresholds = cfg_monitoring['thresholds']
+        cfg_alarm_emails = cfg_monitoring.get('alarm_emails') or []
+
+        period = Duration.minutes(1)
+
+        # The cluster is not created by this stack, so Container Insights is switched on through the API
+        if cfg_monitoring.get('container_insights', True):
+            cluster_settings = {
+                "cluster": cluster.cluster_name,
+                "settings": [{"name": "containerInsights", "value": "enabled"}]
+            }
+            cr.AwsCustomResource(
+                self, "containerinsights",
+                on_create=cr.AwsSdkCall(
+                    service="ECS",
+                    action="updateClusterSettings",
+                    parameters=cluster_settings,
+                    physical_resource_id=cr.PhysicalResourceId.of(f"{cfg_fe_name}-container-insights")
+                ),
+                on_update=cr.AwsSdkCall(
+                    service="ECS",
+                    action="updateClusterSettings",
+                    parameters=cluster_settings,
+                    physical_resource_id=cr.PhysicalResourceId.of(f"{cfg_fe_name}-container-insights")
+                ),
+                policy=cr.AwsCustomResourcePolicy.from_sdk_calls(
+                    resources=[cluster.cluster_arn]
+                )
+            )
+
+        self.topic = sns.Topic(
+            self, "alarmtopic",
+            display_name=f"{cfg_fe_name} performance alarms"
+        )
+
+        for email in cfg_alarm_emails:
+            self.topic.add_subscription(subscriptions.EmailSubscription(email))
+
+        lb_dimensions = {"LoadBalancer": load_balancer.load_balancer_full_name}
+        tg_dimensions = {
+            "LoadBalancer": load_balancer.load_balancer_full_name,
+            "TargetGroup": target_group.target_group_full_name
+        }
+        service_dimensions = {
+            "ClusterName": cluster.cluster_name,
+            "ServiceName": fargate_service.service_name
+        }
+
+        cpu_utilization = fargate_service.metric_cpu_utilization(period=period)
+        memory_utilization = fargate_service.metric_memory_utilization(period=period)
+
+        task_widgets = [
+            cloudwatch.GraphWidget(
+                title="Task CPU utilization (%)",
+                left=[
+                    cpu_utilization,
+                    fargate_service.metric_cpu_utilization(period=period, statistic="Maximum")
+                ],
+                width=8
+            ),
+            cloudwatch.GraphWidget(
+                title="Task memory utilization (%)",
+                left=[
+                    memory_utilization,
+                    fargate_service.metric_memory_utilization(period=period, statistic="Maximum")
+                ],
+                width=8
+            ),
+            cloudwatch.GraphWidget(
+                title="Running tasks",
+                left=[
+                    cloudwatch.Metric(
+                        namespace="ECS/ContainerInsights",
+                        metric_name="RunningTaskCount",
+                        dimensions_map=service_dimensions,
+                        statistic="Average",
+                        period=period
+                    ),
+                    cloudwatch.Metric(
+                        namespace="ECS/ContainerInsights",
+                        metric_name="DesiredTaskCount",
+                        dimensions_map=service_dimensions,
+                        statistic="Average",
+                        period=period
+                    )
+                ],
+                width=8
+            )
+        ]
+
+        alarms = [
+            cloudwatch.Alarm(
+                self, "cpusaturationalarm",
+                alarm_description=f"{cfg_fe_name} tasks are CPU saturated",
+                metric=cpu_utilization,
+                threshold=cfg_thresholds['cpu_utilization'],
+                evaluation_periods=cfg_thresholds['evaluation_periods'],
+                comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+            )
+        ]
+
+        # Only the ALB publishes response times and HTTP status codes, the NLB sees TCP flows
+        if cfg_fe_lb_mode == "alb":
+            requests = cloudwatch.Metric(
+                namespace="AWS/ApplicationELB",
+                metric_name="RequestCount",
+                dimensions_map=lb_dimensions,
+                statistic="Sum",
+                period=period
+            )
+            target_5xx = cloudwatch.Metric(
+                namespace="AWS/ApplicationELB",
+                metric_name="HTTPCode_Target_5XX_Count",
+                dimensions_map=lb_dimensions,
+                statistic="Sum",
+                period=period
+            )
+            error_rate_5xx = cloudwatch.MathExpression(
+                expression="100 * FILL(errors, 0) / requests",
+                using_metrics={"errors": target_5xx, "requests": requests},
+                label="Target 5xx rate (%)",
+                period=period
+            )
+            p99_latency = cloudwatch.Metric(
+                namespace="AWS/ApplicationELB",
+                metric_name="TargetResponseTime",
+                dimensions_map=lb_dimensions,
+                statistic="p99",
+                period=period
+            )
+
+            lb_widgets = [
+                cloudwatch.GraphWidget(
+                    title="Target response time (s)",
+                    left=[
+                        cloudwatch.Metric(
+                            namespace="AWS/ApplicationELB",
+                            metric_name="TargetResponseTime",
+                            dimensions_map=lb_dimensions,
+                            statistic=statistic,
+                            period=period
+                        ) for statistic in ["p50", "p90"]
+                    ] + [p99_latency],
+                    width=8
+                ),
+                cloudwatch.GraphWidget(
+                    title="Requests and active connections",
+                    left=[requests],
+                    right=[
+                        cloudwatch.Metric(
+                            namespace="AWS/ApplicationELB",
+                            metric_name="ActiveConnectionCount",
+                            dimensions_map=lb_dimensions,
+                            statistic="Sum",
+                            period=period
+                        )
+                    ],
+                    width=8
+                ),
+                cloudwatch.GraphWidget(
+                    title="Target 5xx rate (%)",
+                    left=[error_rate_5xx],
+                    width=8
+                )
+            ]
+
+            alarms += [
+                cloudwatch.Alarm(
+                    self, "p99latencyalarm",
+                    alarm_description=f"p99 response time of {cfg_fe_name} is too high",
+                    metric=p99_latency,
+                    threshold=cfg_thresholds['p99_latency'],
+                    evaluation_periods=cfg_thresholds['evaluation_periods'],
+                    comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                    treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+                ),
+                cloudwatch.Alarm(
+                    self, "error5xxalarm",
+                    alarm_description=f"5xx rate of {cfg_fe_name} is too high",
+                    metric=error_rate_5xx,
+                    threshold=cfg_thresholds['error_rate_5xx'],
+                    evaluation_periods=cfg_thresholds['evaluation_periods'],
+                    comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                    treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+                )
+            ]
+        else:
+            unhealthy_hosts = cloudwatch.Metric(
+                namespace="AWS/NetworkELB",
+                metric_name="UnHealthyHostCount",
+                dimensions_map=tg_dimensions,
+                statistic="Maximum",
+                period=period
+            )
+
+            lb_widgets = [
+                cloudwatch.GraphWidget(
+                    title="Active and new flows",
+                    left=[
+                        cloudwatch.Metric(
+                            namespace="AWS/NetworkELB",
+                            metric_name="ActiveFlowCount",
+                            dimensions_map=lb_dimensions,
+                            statistic="Average",
+                            period=period
+                        )
+                    ],
+                    right=[
+                        cloudwatch.Metric(
+                            namespace="AWS/NetworkELB",
+                            metric_name="NewFlowCount",
+                            dimensions_map=lb_dimensions,
+                            statistic="Sum",
+                            period=period
+                        )
+                    ],
+                    width=8
+                ),
+                cloudwatch.GraphWidget(
+                    title="Target TCP resets",
+                    left=[
+                        cloudwatch.Metric(
+                            namespace="AWS/NetworkELB",
+                            metric_name="TCP_Target_Reset_Count",
+                            dimensions_map=lb_dimensions,
+                            statistic="Sum",
+                            period=period
+                        )
+                    ],
+                    width=8
+                ),
+                cloudwatch.GraphWidget(
+                    title="Healthy and unhealthy targets",
+                    left=[
+                        cloudwatch.Metric(
+                            namespace="AWS/NetworkELB",
+                            metric_name="HealthyHostCount",
+                            dimensions_map=tg_dimensions,
+                            statistic="Minimum",
+                            period=period
+                        ),
+                        unhealthy_hosts
+                    ],
+                    width=8
+                )
+            ]
+
+            alarms.append(
+                cloudwatch.Alarm(
+                    self, "unhealthyhostsalarm",
+                    alarm_description=f"{cfg_fe_name} has unhealthy targets",
+                    metric=unhealthy_hosts,
+                    threshold=0,
+                    evaluation_periods=cfg_thresholds['evaluation_periods'],
+                    comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                    treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+                )
+            )
+
+        for alarm in alarms:
+            alarm.add_alarm_action(cloudwatch_actions.SnsAction(self.topic))
+            alarm.add_ok_action(cloudwatch_actions.SnsAction(self.topic))
+
+        pipeline_widgets = [
+            cloudwatch.GraphWidget(
+                title="Image build stage durations (s)",
+                left=[
+                    cloudwatch.Metric(
+                        namespace="AWS/CodeBuild",
+                        metric_name=metric_name,
+                        dimensions_map={"ProjectName": f"{cfg_fe_name}-build"},
+                        statistic="Average",
+                        period=Duration.hours(1)
+                    ) for metric_name in BUILD_DURATION_METRICS
+                ],
+                width=16
+            ),
+            cloudwatch.AlarmStatusWidget(
+                title="Alarms",
+                alarms=alarms,
+                width=8
+            )
+        ]
+
+        self.dashboard = cloudwatch.Dashboard(
+            self, "dashboard",
+            dashboard_name=f"{cfg_fe_name}-{Stack.of(self).region}-performance",
+            widgets=[lb_widgets, task_widgets, pipeline_widgets]
+        )
@@ -0,0 +1,162 @@
+import fnmatch
+import json
+import os
+
+import jsii
+from aws_cdk import (
+    Annotations, CfnResource, IAspect, Stack,
+    aws_applicationautoscaling as appscaling,
+    aws_codebuild as codebuild,
+    aws_ecs as ecs,
+    aws_events as events,
+    aws_logs as logs
+)
+
+from constructs import IConstruct
+
+# Rules of the policy and the message reported for them, the severity is set in config.yaml
+PERFORMANCE_RULES = {
+    "log-retention": "Log group without retention, the logs are kept and billed forever",
+    "service-scaling": "ECS service without a scaling policy, it cannot follow the load",
+    "service-desired-count": "ECS service with a desired count of 0, it serves nothing until scaled by hand",
+    "codebuild-cache": "CodeBuild project without cache, every build starts cold",
+    "buildspec-no-cache": "Buildspec runs docker build with --no-cache, the layer cache is never used",
+    "container-health-check": "Container with port mappings but no health check, ECS cannot replace it when it hangs",
+    "awslogs-blocking": "awslogs driver in blocking mode, a slow CloudWatch Logs API stalls the container",
+    "duplicate-event-rules": "Several EventBridge rules start the same target, every event runs it more than once"
+}
+
+SEVERITIES = ["error", "warning", "off"]
+
+SUPPRESSION_METADATA = "performance-policy:suppress"
+
+
+@jsii.implements(IAspect)
+class PerformancePolicy:
+    """Reports settings that are known to be slow or unbounded as synth errors or warnings"""
+
+    def __init__(self, config: dict, base_dir: str) -> None:
+        self.severities = {rule: "warning" for rule in PERFORMANCE_RULES}
+        self.severities.update(config.get('rules') or {})
+        self.suppressions = config.get('suppressions') or []
+
+        unknown = [rule for rule, severity in self.severities.items()
+                   if rule not in PERFORMANCE_RULES or severity not in SEVERITIES]
+        if unknown:
+            raise RuntimeError(
+                f"Unknown performance_policy rules or severities: {', '.join(unknown)}, "
+                f"choose from {', '.join(PERFORMANCE_RULES)} and {', '.join(SEVERITIES)}"
+            )
+
+        # Paths are relative to config.yaml, a missing copy would silently turn the buildspec check off
+        self.buildspec_files = {}
+        for path in config.get('buildspec_files') or []:
+            full_path = os.path.normpath(os.path.join(base_dir, path))
+            if not os.path.isfile(full_path):
+                raise RuntimeError(f"performance_policy.buildspec_files: {path} does not exist in {base_dir}")
+            with open(full_path) as build_spec_file:
+                self.buildspec_files[path] = build_spec_file.read()
+
+    @staticmethod
+    def suppress(scope: IConstruct, rule: str, reason: str) -> None:
+        """
+        Suppress a rule for a construct and everything inside of it
+        """
+        scope.node.add_metadata(SUPPRESSION_METADATA, {"rule": rule, "reason": reason})
+
+    def is_suppressed(self, construct: IConstruct, rule: str) -> bool:
+        for suppression in self.suppressions:
+            if suppression['rule'] == rule and fnmatch.fnmatch(construct.node.path, suppression['path']):
+                return True
+        for scope in construct.node.scopes:
+            for entry in scope.node.metadata:
+                if entry.type == SUPPRESSION_METADATA and entry.data['rule'] == rule:
+                    return True
+        return False
+
+    def report(self, construct: IConstruct, rule: str, detail: str = "") -> None:
+        severity = self.severities[rule]
+        if severity == "off" or self.is_suppressed(construct, rule):
+            return
+        message = f"[{rule}] {PERFORMANCE_RULES[rule]}{detail}"
+        if severity == "error":
+            Annotations.of(construct).add_error(message)
+        else:
+            Annotations.of(construct).add_warning_v2(f"performance-policy:{rule}", message)
+
+    def visit(self, node: IConstruct) -> None:
+        # Rules look at several resources of a stack at once, so the policy works stack by stack
+        if not isinstance(node, Stack):
+            return
+
+        resources = [
+            construct for construct in node.node.find_all()
+            if isinstance(construct, CfnResource) and Stack.of(construct).node.path == node.node.path
+        ]
+
+        self.check_log_groups(node, resources)
+        self.check_services(node, resources)
+        self.check_build_projects(node, resources)
+        self.check_task_definitions(node, resources)
+        self.check_event_rules(node, resources)
+
+    def check_log_groups(self, stack: Stack, resources: list) -> None:
+        for log_group in resources:
+            if isinstance(log_group, logs.CfnLogGroup) and log_group.retention_in_days is None:
+                self.report(log_group, "log-retention")
+
+    def check_services(self, stack: Stack, resources: list) -> None:
+        scalable_targets = [
+            json.dumps(stack.resolve(resource.resource_id)) for resource in resources
+            if isinstance(resource, appscaling.CfnScalableTarget)
+        ]
+        for service in resources:
+            if not isinstance(service, ecs.CfnService):
+                continue
+            if service.desired_count == 0:
+                self.report(service, "service-desired-count")
+            logical_id = stack.resolve(stack.get_logical_id(service))
+            if not any(logical_id in resource_id for resource_id in scalable_targets):
+                self.report(service, "service-scaling")
+
+    def check_build_projects(self, stack: Stack, resources: list) -> None:
+        for project in resources:
+            if not isinstance(project, codebuild.CfnProject):
+                continue
+            cache = stack.resolve(project.cache) or {}
+            if cache.get('type', "NO_CACHE") == "NO_CACHE":
+                self.report(project, "codebuild-cache")
+
+            # Inline buildspecs are checked as they are, buildspec files of the source repo through their local copies
+            build_spec = (stack.resolve(project.source) or {}).get('buildSpec') or ""
+            if "\n" in build_spec:
+                build_specs = {"inline buildspec": build_spec}
+            else:
+                build_specs = self.buildspec_files
+            for source, content in build_specs.items():
+                if "--no-cache" in content:
+                    self.report(project, "buildspec-no-cache", f" ({source})")
+
+    def check_task_definitions(self, stack: Stack, resources: list) -> None:
+        for task_definition in resources:
+            if not isinstance(task_definition, ecs.CfnTaskDefinition):
+                continue
+            for container in stack.resolve(task_definition.container_definitions) or []:
+                if container.get('portMappings') and not container.get('healthCheck'):
+                    self.report(task_definition, "container-health-check", f" ({container['name']})")
+                log_configuration = container.get('logConfiguration') or {}
+                if log_configuration.get('logDriver') == "awslogs" and \
+                        (log_configuration.get('options') or {}).get('mode') != "non-blocking":
+                    self.report(task_definition, "awslogs-blocking", f" ({container['name']})")
+
+    def check_event_rules(self, stack: Stack, resources: list) -> None:
+        rules_by_target = {}
+        for rule in resources:
+            if not isinstance(rule, events.CfnRule):
+                continue
+            for target in stack.resolve(rule.targets) or []:
+                rules_by_target.setdefault(json.dumps(target['arn'], sort_keys=True), []).append(rule)
+        for target, rules in rules_by_target.items():
+            if len(rules) > 1:
+                for rule in rules:
+                    self.report(rule, "duplicate-event-rules", f" ({len(rules)} rules for {target})")
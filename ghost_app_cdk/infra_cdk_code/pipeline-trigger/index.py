@@ -0,0 +1,61 @@
+import fnmatch
+import json
+import os
+
+import boto3
+
+PIPELINE_NAME = os.environ["PIPELINE_NAME"]
+REPOSITORY_NAME = os.environ["REPOSITORY_NAME"]
+SOURCE_ROLE_ARN = os.environ["SOURCE_ROLE_ARN"]
+INCLUDE_PATHS = json.loads(os.environ["INCLUDE_PATHS"])
+EXCLUDE_PATHS = json.loads(os.environ["EXCLUDE_PATHS"])
+
+codepipeline = boto3.client("codepipeline")
+
+
+def codecommit_client():
+    # The repository lives in the service account, so its API is called with the cross-account role
+    credentials = boto3.client("sts").assume_role(
+        RoleArn=SOURCE_ROLE_ARN,
+        RoleSessionName="pipeline-trigger"
+    )["Credentials"]
+    return boto3.client(
+        "codecommit",
+        aws_access_key_id=credentials["AccessKeyId"],
+        aws_secret_access_key=credentials["SecretAccessKey"],
+        aws_session_token=credentials["SessionToken"]
+    )
+
+
+def changed_paths(old_commit_id, commit_id):
+    paginator = codecommit_client().get_paginator("get_differences")
+    pages = paginator.paginate(
+        repositoryName=REPOSITORY_NAME,
+        beforeCommitSpecifier=old_commit_id,
+        afterCommitSpecifier=commit_id
+    )
+    for page in pages:
+        for difference in page["differences"]:
+            for blob in ("afterBlob", "beforeBlob"):
+                if blob in difference:
+                    yield difference[blob]["path"]
+
+
+def triggers_build(path):
+    included = any(fnmatch.fnmatch(path, pattern) for pattern in INCLUDE_PATHS)
+    excluded = any(fnmatch.fnmatch(path, pattern) for pattern in EXCLUDE_PATHS)
+    return included and not excluded
+
+
+def handler(event, context):
+    detail = event["detail"]
+    old_commit_id = detail.get("oldCommitId")
+    commit_id = detail["commitId"]
+
+    # A new branch has no previous commit to compare with, so it is always built
+    if old_commit_id and not any(triggers_build(path) for path in changed_paths(old_commit_id, commit_id)):
+        print(f"Skipping {commit_id}, no change matches the trigger paths")
+        return
+
+    execution = codepipeline.start_pipeline_execution(name=PIPELINE_NAME)
+    print(f"Started {execution['pipelineExecutionId']} for {commit_id}")
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""Task right-sizing of a Ghost service from its Container Insights history.
+
+Reads the task CPU and memory use of the ECS service from CloudWatch, picks the cheapest valid Fargate size
+that covers a percentile of it plus headroom and prints the change as a diff of config.yaml.
+Usage: python3 right_size.py [--account account_1] [--app parameters] [--days 14] [--profile prod] > proposal.diff
+       python3 right_size.py --fixture right-sizing/fixture.json  # offline, no AWS calls
+Apply the proposal with: patch config.yaml < proposal.diff
+"""
+import argparse
+import datetime
+import difflib
+import json
+import math
+import os
+import re
+import sys
+
+from ruamel.yaml import YAML
+
+from infra_cdk_code.config_model import select, service_name_parameter
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Valid Fargate memory sizes (MiB) of every task CPU size (CPU units)
+FARGATE_SIZES = {
+    256: [512, 1024, 2048],
+    512: list(range(1024, 4096 + 1, 1024)),
+    1024: list(range(2048, 8192 + 1, 1024)),
+    2048: list(range(4096, 16384 + 1, 1024)),
+    4096: list(range(8192, 30720 + 1, 1024)),
+    8192: list(range(16384, 61440 + 1, 4096)),
+    16384: list(range(32768, 122880 + 1, 8192)),
+}
+
+# On-demand Linux price per hour of a vCPU and a GB (us-east-1), used to rank the sizes and estimate the change
+FARGATE_PRICES = {
+    "X86_64": (0.04048, 0.004445),
+    "ARM64": (0.03238, 0.00356),
+}
+
+# With the ClusterName and ServiceName dimensions Container Insights reports the use of all tasks of the service,
+# every query divides it by the running tasks of the period. Maximum is the busiest minute of the period
+METRIC_QUERIES = {
+    "cpu_max": ("CpuUtilized", "Maximum"),
+    "cpu_avg": ("CpuUtilized", "Average"),
+    "mem_max": ("MemoryUtilized", "Maximum"),
+    "mem_avg": ("MemoryUtilized", "Average"),
+}
+TASK_COUNT_QUERY = ("RunningTaskCount", "Average")
+
+# Ghost itself never gets less than this, whatever the history says
+MIN_CONTAINER_CPU = 256
+MIN_CONTAINER_MEMORY = 512
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Propose td_cpu, td_memory, container_cpu, container_memory and "
+                                                 "node_max_old_space_size from the CloudWatch history of the service")
+    parser.add_argument("--config", default=os.path.join(APP_DIR, "config.yaml"), help="config.yaml to read and diff")
+    parser.add_argument("--account", help="Key under aws_vars whose service is measured, the first one by default")
+    parser.add_argument("--app", help="Key under frontend-ghost-app, the first one by default")
+    parser.add_argument("--profile", help="AWS profile with cloudwatch:GetMetricData and ssm:GetParameter in the account")
+    parser.add_argument("--fixture", help="JSON with the layout of a GetMetricData response, read instead of CloudWatch")
+    parser.add_argument("--days", type=int, default=14, help="Days of history, cover at least one weekly peak")
+    parser.add_argument("--period", type=int, default=300, help="Seconds per datapoint")
+    parser.add_argument("--cpu-percentile", type=float, default=95,
+                        help="CPU above the size is throttled, a short burst is acceptable")
+    parser.add_argument("--memory-percentile", type=float, default=99,
+                        help="Memory above the size kills the task, keep it close to the peak")
+    parser.add_argument("--headroom", type=float, default=20, help="Percent added on top of the percentiles")
+    parser.add_argument("--heap-ratio", type=float, default=75,
+                        help="Percent of container_memory given to the V8 heap, the rest is native memory of node")
+    return parser.parse_args()
+
+
+def fetch_metrics(acc: dict, fe: dict, args: argparse.Namespace) -> dict:
+    """
+    Read the task CPU and memory history of the service from Container Insights
+    :return: dict with the datapoint values of every metric query
+    """
+    # Only needed for the CloudWatch reads, the fixture runs without it
+    import boto3
+
+    session = boto3.Session(profile_name=args.profile, region_name=acc['region'])
+    client = session.client("cloudwatch")
+    # The infra stack publishes the generated name of the service
+    service_name = session.client("ssm").get_parameter(Name=service_name_parameter(acc, fe))['Parameter']['Value']
+    end_time = datetime.datetime.now(datetime.timezone.utc)
+    dimensions = [
+        {"Name": "ClusterName", "Value": fe['ecs']['cluster_name']},
+        {"Name": "ServiceName", "Value": service_name}
+    ]
+    totals = dict({f"{query_id}_total": query for query_id, query in METRIC_QUERIES.items()}, tasks=TASK_COUNT_QUERY)
+    queries = [
+        {
+            "Id": query_id,
+            "MetricStat": {
+                "Metric": {"Namespace": "ECS/ContainerInsights", "MetricName": metric, "Dimensions": dimensions},
+                "Period": args.period,
+                "Stat": stat
+            },
+            "ReturnData": False
+        }
+        for query_id, (metric, stat) in totals.items()
+    ] + [
+        # Periods without running tasks have no use per task and are left out
+        {
+            "Id": query_id,
+            "Expression": f"IF(tasks > 0, {query_id}_total / tasks)",
+            "Label": f"{metric} {stat} per task"
+        }
+        for query_id, (metric, stat) in METRIC_QUERIES.items()
+    ]
+
+    values = {query_id: [] for query_id in METRIC_QUERIES}
+    for page in client.get_paginator("get_metric_data").paginate(
+            MetricDataQueries=queries,
+            StartTime=end_time - datetime.timedelta(days=args.days),
+            EndTime=end_time):
+        for result in page['MetricDataResults']:
+            values[result['Id']].extend(result['Values'])
+    return values
+
+
+def load_fixture(path: str) -> dict:
+    """
+    Read the datapoints of a stored GetMetricData response
+    :return: dict with the datapoint values of every metric query
+    """
+    with open(path) as fixture_file:
+        results = json.load(fixture_file)['MetricDataResults']
+    return {result['Id']: result['Values'] for result in results}
+
+
+def percentile(values: list, rank: float) -> float:
+    """
+    Nearest rank percentile
+    :return: the value below which rank percent of the values fall
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(rank / 100 * len(ordered)) - 1)]
+
+
+def sidecar_reservations(fe: dict) -> tuple:
+    """
+    CPU and memory reserved by the sidecars of the task, the same ones the infra stack adds
+    :return: tuple with the CPU units and the MiB
+    """
+    cpu, memory = 0, 0
+    if fe.get('nginx'):
+        cpu += fe['nginx']['cpu']
+        memory += fe['nginx']['memory']
+    if fe.get('tracing'):
+        cpu += fe['tracing']['collector_cpu']
+        memory += fe['tracing']['collector_memory']
+    if fe['logging'].get('driver') == "firelens":
+        cpu += fe['logging']['firelens']['cpu']
+        memory += fe['logging']['firelens']['memory']
+    return cpu, memory
+
+
+def hourly_price(cpu: int, memory: int, architecture: str) -> float:
+    vcpu_price, gb_price = FARGATE_PRICES[architecture]
+    return cpu / 1024 * vcpu_price + memory / 1024 * gb_price
+
+
+def recommend(values: dict, fe: dict, args: argparse.Namespace) -> dict:
+    """
+    Cheapest valid Fargate size that covers the measured use, the sidecars and the minimum of Ghost
+    :return: dict with the proposed ecs settings
+    """
+    architecture = fe['ecs'].get('cpu_architecture') or "X86_64"
+    sidecar_cpu, sidecar_memory = sidecar_reservations(fe)
+    headroom = 1 + args.headroom / 100
+
+    # The task metrics include the sidecars, so the measured use is compared with the task size
+    cpu_needed = max(percentile(values['cpu_max'], args.cpu_percentile) * headroom, sidecar_cpu + MIN_CONTAINER_CPU)
+    memory_needed = max(percentile(values['mem_max'], args.memory_percentile) * headroom,
+                        sidecar_memory + MIN_CONTAINER_MEMORY)
+
+    sizes = [
+        (cpu, memory)
+        for cpu, memories in FARGATE_SIZES.items()
+        for memory in memories
+        if cpu >= cpu_needed and memory >= memory_needed
+    ]
+    if not sizes:
+        sys.exit(f"No Fargate size has {cpu_needed:.0f} CPU units and {memory_needed:.0f} MiB, split the load over more tasks")
+    td_cpu, td_memory = min(sizes, key=lambda size: (hourly_price(*size, architecture), size))
+
+    container_memory = td_memory - sidecar_memory
+    # Rounded down to 32 MiB, what is left of container_memory holds the buffers and native modules of node
+    node_heap = int(container_memory * args.heap_ratio / 100) // 32 * 32
+
+    return {
+        "td_cpu": td_cpu,
+        "td_memory": td_memory,
+        "container_cpu": td_cpu - sidecar_cpu,
+        "container_memory": container_memory,
+        "node_max_old_space_size": node_heap,
+        "cpu_needed": cpu_needed,
+        "memory_needed": memory_needed,
+    }
+
+
+def config_diff(config_path: str, app_key: str, proposal: dict) -> str:
+    """
+    Write the proposal into the ecs block of the app, only the values change, the comments and quotes of the file are kept
+    :return: unified diff of the file
+    """
+    with open(config_path) as config_file:
+        original = config_file.read().splitlines(keepends=True)
+
+    # Path of the ecs block in config.yaml and the indent of its settings
+    block_path = ["frontend-ghost-app:", f"  {app_key}:", "    ecs:"]
+    setting_indent = "      "
+    proposed = list(original)
+    in_block = False
+    for index, line in enumerate(original):
+        if block_path and line.rstrip() == block_path[0]:
+            block_path.pop(0)
+            in_block = not block_path
+            continue
+        if not in_block:
+            continue
+        if line.strip() and not line.lstrip().startswith("#") and not line.startswith(setting_indent):
+            break
+        match = re.match(rf"^{setting_indent}(\w+):([^#\n]*)(#.*)?$", line)
+        if match and match.group(1) in proposal:
+            comment = f" {match.group(3)}" if match.group(3) else ""
+            proposed[index] = f"{setting_indent}{match.group(1)}: {proposal[match.group(1)]}{comment}\n"
+
+    name = os.path.basename(config_path)
+    return "".join(difflib.unified_diff(original, proposed, fromfile=f"a/{name}", tofile=f"b/{name}"))
+
+
+def main() -> None:
+    args = parse_args()
+    with open(args.config) as config_file:
+        config = YAML(typ="safe").load(config_file)
+    account_key, acc = select(config['aws_vars'], args.account, "accounts")
+    app_key, fe = select(config['frontend-ghost-app'], args.app, "apps")
+
+    values = load_fixture(args.fixture) if args.fixture else fetch_metrics(acc, fe, args)
+    datapoints = min(len(series) for series in values.values())
+    if datapoints < 86400 // args.period:
+        sys.exit(f"Only {datapoints} datapoints of {fe['code']['name']} in {account_key}, "
+                 "at least one day of Container Insights history is needed")
+
+    proposal = recommend(values, fe, args)
+    architecture = fe['ecs'].get('cpu_architecture') or "X86_64"
+    current = {key: fe['ecs'].get(key) for key in ("td_cpu", "td_memory")}
+
+    # The summary goes to stderr so the diff on stdout can be redirected to a file
+    report = [
+        f"{fe['code']['name']} in {account_key}, {datapoints} datapoints of {args.period}s",
+        f"task CPU units: avg {sum(values['cpu_avg']) / len(values['cpu_avg']):.0f}, "
+        f"p{args.cpu_percentile:g} per task in the busiest minutes {percentile(values['cpu_max'], args.cpu_percentile):.0f}, "
+        f"needed with headroom and sidecars {proposal['cpu_needed']:.0f}",
+        f"task memory MiB: avg {sum(values['mem_avg']) / len(values['mem_avg']):.0f}, "
+        f"p{args.memory_percentile:g} per task in the busiest minutes {percentile(values['mem_max'], args.memory_percentile):.0f}, "
+        f"needed with headroom and sidecars {proposal['memory_needed']:.0f}",
+        f"proposed task size {proposal['td_cpu']}/{proposal['td_memory']}, "
+        f"{hourly_price(proposal['td_cpu'], proposal['td_memory'], architecture) * 730:.2f} USD per task and month",
+    ]
+    if current['td_cpu'] and current['td_memory']:
+        report.append(f"current task size {current['td_cpu']}/{current['td_memory']}, "
+                      f"{hourly_price(int(current['td_cpu']), int(current['td_memory']), architecture) * 730:.2f} "
+                      "USD per task and month")
+    print("\n".join(report), file=sys.stderr)
+
+    diff = config_diff(args.config, app_key, proposal)
+    if diff:
+        print(diff, end="")
+    else:
+        print("config.yaml already has the proposed sizes", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
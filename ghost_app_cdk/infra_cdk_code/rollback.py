@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""Rollback of a Ghost service to a release that is already in ECR.
+
+Lists the commit-<sha> images the pipeline pushed, registers a copy of the running task definition with the digest
+of the chosen release and deploys it in the main region and every additional region, without a rebuild.
+Usage: python3 rollback.py [--account account_1] [--app parameters] [--profile prod] --list
+       python3 rollback.py [--account account_1] [--app parameters] [--profile prod] --previous
+       python3 rollback.py [--account account_1] [--app parameters] [--profile prod] --to commit-1a2b3c4d5e6f
+The next run of the pipeline deploys the head of the branch again, revert the bad commit before it runs.
+"""
+import argparse
+import json
+import os
+import sys
+
+from ruamel.yaml import YAML
+
+from infra_cdk_code.config_model import select, service_name_parameter
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Tags the buildspec pushes, one per commit, the ECR repository does not let them move
+RELEASE_TAG_PREFIX = "commit-"
+
+# Read only fields of DescribeTaskDefinition that RegisterTaskDefinition does not accept, the buildspec drops the same
+READ_ONLY_FIELDS = ["taskDefinitionArn", "revision", "status", "requiresAttributes", "compatibilities",
+                    "registeredAt", "registeredBy", "deregisteredAt"]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Redeploy an earlier image of the app by its digest, without a rebuild")
+    parser.add_argument("--config", default=os.path.join(APP_DIR, "config.yaml"), help="config.yaml to read")
+    parser.add_argument("--account", help="Key under aws_vars whose services are rolled back, the first one by default")
+    parser.add_argument("--app", help="Key under frontend-ghost-app, the first one by default")
+    parser.add_argument("--profile", help="AWS profile with ECR, ECS, CodeDeploy and SSM access in the account")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--list", action="store_true", help="Print the releases in ECR, the running one is marked")
+    target.add_argument("--previous", action="store_true", help="Roll back to the release before the running one")
+    target.add_argument("--to", metavar="TAG", help="Roll back to this commit-<sha> tag")
+    parser.add_argument("--keep-traffic-routing", action="store_true",
+                        help="Blue/green only, shift the traffic in the steps of the deployment group instead of "
+                             "all at once")
+    parser.add_argument("--no-wait", action="store_true", help="Return once the deployments are started")
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan without changing anything")
+    return parser.parse_args()
+
+
+def releases(ecr_client, repository: str) -> list:
+    """
+    Images of the repository with a release tag, newest first
+    :return: list of dicts with the tag, the digest and the push time
+    """
+    found = []
+    for page in ecr_client.get_paginator("describe_images").paginate(
+            repositoryName=repository,
+            filter={"tagStatus": "TAGGED"}):
+        for image in page['imageDetails']:
+            for tag in image.get('imageTags', []):
+                if tag.startswith(RELEASE_TAG_PREFIX):
+                    found.append({"tag": tag, "digest": image['imageDigest'], "pushed_at": image['imagePushedAt']})
+    return sorted(found, key=lambda release: release['pushed_at'], reverse=True)
+
+
+def service_name(session, region: str, acc: dict, fe: dict) -> str:
+    """
+    Name of the ECS service in a region, the infra stack publishes it in SSM
+    :return: name of the service
+    """
+    parameter = service_name_parameter(acc, fe)
+    return session.client("ssm", region_name=region).get_parameter(Name=parameter)['Parameter']['Value']
+
+
+def running_task_definition(ecs_client, cluster: str, service: str) -> tuple:
+    """
+    Task definition the service runs, with its tags
+    :return: tuple with the task definition and its tags
+    """
+    services = ecs_client.describe_services(cluster=cluster, services=[service])['services']
+    if not services or services[0]['status'] != "ACTIVE":
+        sys.exit(f"Service {service} is not active in cluster {cluster}")
+    response = ecs_client.describe_task_definition(taskDefinition=services[0]['taskDefinition'], include=["TAGS"])
+    return response['taskDefinition'], response.get('tags') or []
+
+
+def container_image(task_definition: dict, container_name: str) -> str:
+    for container in task_definition['containerDefinitions']:
+        if container['name'] == container_name:
+            return container['image']
+    sys.exit(f"Task definition {task_definition['taskDefinitionArn']} has no container {container_name}")
+
+
+def pick_release(found: list, current_digest: str, args: argparse.Namespace) -> dict:
+    """
+    Release to roll back to, the named tag or the newest one pushed before the running one
+    :return: dict with the tag, the digest and the push time
+    """
+    if args.to:
+        for release in found:
+            if release['tag'] == args.to:
+                return release
+        sys.exit(f"{args.to} is not in ECR, it may have expired, run with --list to see the releases")
+
+    current = [index for index, release in enumerate(found) if release['digest'] == current_digest]
+    if not current:
+        sys.exit(f"The running image {current_digest} is not a release in ECR, use --to with a tag of --list")
+    for release in found[current[-1] + 1:]:
+        if release['digest'] != current_digest:
+            return release
+    sys.exit("There is no release older than the running one")
+
+
+def register_revision(ecs_client, task_definition: dict, tags: list, container_name: str, image: str) -> str:
+    """
+    Copy of the task definition with another image of the app container
+    :return: ARN of the new revision
+    """
+    revision = {key: value for key, value in task_definition.items() if key not in READ_ONLY_FIELDS}
+    for container in revision['containerDefinitions']:
+        if container['name'] == container_name:
+            container['image'] = image
+    if tags:
+        revision['tags'] = tags
+    return ecs_client.register_task_definition(**revision)['taskDefinition']['taskDefinitionArn']
+
+
+def deploy_blue_green(codedeploy_client, fe: dict, task_definition_arn: str, args: argparse.Namespace) -> str:
+    """
+    Start a CodeDeploy deployment of the revision with the appspec the buildspec writes
+    :return: id of the deployment
+    """
+    app_name = fe['code']['name']
+    target_container_name = f"{app_name}-nginx" if fe.get('nginx') else f"{app_name}-container"
+    target_container_port = fe['nginx']['port'] if fe.get('nginx') else fe['ecs']['container_port']
+    appspec = {
+        "version": 0.0,
+        "Resources": [{
+            "TargetService": {
+                "Type": "AWS::ECS::Service",
+                "Properties": {
+                    "TaskDefinition": task_definition_arn,
+                    "LoadBalancerInfo": {
+                        "ContainerName": target_container_name,
+                        "ContainerPort": int(target_container_port)
+                    }
+                }
+            }
+        }]
+    }
+    deployment = {
+        "applicationName": app_name,
+        "deploymentGroupName": app_name,
+        "description": f"Rollback to {task_definition_arn}",
+        "revision": {"revisionType": "AppSpecContent", "appSpecContent": {"content": json.dumps(appspec)}}
+    }
+    # A rollback moves away from a bad release, so by default it does not wait through the canary steps
+    if not args.keep_traffic_routing:
+        deployment['deploymentConfigName'] = "CodeDeployDefault.ECSAllAtOnce"
+    return codedeploy_client.create_deployment(**deployment)['deploymentId']
+
+
+def main() -> None:
+    args = parse_args()
+    with open(args.config) as config_file:
+        config = YAML(typ="safe").load(config_file)
+    account_key, acc = select(config['aws_vars'], args.account, "accounts")
+    _, fe = select(config['frontend-ghost-app'], args.app, "apps")
+
+    # Only needed once the config is read, so a wrong key fails without AWS credentials
+    import boto3
+
+    session = boto3.Session(profile_name=args.profile)
+    app_name = fe['code']['name']
+    cluster = fe['ecs']['cluster_name']
+    container_name = f"{app_name}-container"
+    blue_green = fe['ecs']['deployment'].get('blue_green')
+    regions = [acc['region']] + [region['region'] for region in acc.get('regions') or []]
+    services = {region: service_name(session, region, acc, fe) for region in regions}
+
+    found = releases(session.client("ecr", region_name=acc['region']), app_name)
+    if not found:
+        sys.exit(f"No {RELEASE_TAG_PREFIX} images of {app_name} in {account_key}, the pipeline has not pushed a release yet")
+
+    ecs_client = session.client("ecs", region_name=acc['region'])
+    task_definition, tags = running_task_definition(ecs_client, cluster, services[acc['region']])
+    current_digest = container_image(task_definition, container_name).rpartition("@")[2]
+
+    if args.list:
+        for release in found:
+            marker = "*" if release['digest'] == current_digest else " "
+            print(f"{marker} {release['tag']}  {release['pushed_at']:%Y-%m-%d %H:%M}  {release['digest']}")
+        return
+
+    release = pick_release(found, current_digest, args)
+    if release['digest'] == current_digest:
+        sys.exit(f"{app_name} in {account_key} already runs {release['tag']}")
+    print(f"roll back {app_name} in {account_key} to {release['tag']} ({release['digest']}), "
+          f"pushed {release['pushed_at']:%Y-%m-%d %H:%M}", file=sys.stderr)
+
+    # ECR replication keeps the digest, so every region pulls the same image from its own repository
+    waits = []
+    for index, region in enumerate(regions):
+        image = f"{acc['accountId']}.dkr.ecr.{region}.amazonaws.com/{app_name}@{release['digest']}"
+        ecs_client = session.client("ecs", region_name=region)
+        if args.dry_run:
+            print(f"{region}: would deploy {image}", file=sys.stderr)
+            continue
+
+        if index:
+            task_definition, tags = running_task_definition(ecs_client, cluster, services[region])
+        task_definition_arn = register_revision(ecs_client, task_definition, tags, container_name, image)
+
+        # Additional regions keep rolling updates, like the deploy-regions stage of the pipeline
+        if blue_green and not index:
+            codedeploy_client = session.client("codedeploy", region_name=region)
+            deployment_id = deploy_blue_green(codedeploy_client, fe, task_definition_arn, args)
+            print(f"{region}: CodeDeploy deployment {deployment_id} of {task_definition_arn}", file=sys.stderr)
+            waits.append((codedeploy_client.get_waiter("deployment_successful"), {"deploymentId": deployment_id}))
+        else:
+            ecs_client.update_service(cluster=cluster, service=services[region], taskDefinition=task_definition_arn)
+            print(f"{region}: service update to {task_definition_arn}", file=sys.stderr)
+            waits.append((ecs_client.get_waiter("services_stable"), {"cluster": cluster, "services": [services[region]]}))
+
+    if args.no_wait:
+        return
+    for waiter, params in waits:
+        waiter.wait(**params, WaiterConfig={"Delay": 15, "MaxAttempts": 120})
+    print(f"{app_name} in {account_key} runs {release['tag']}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""Synth timing of app.py for a generated config with many accounts.
+
+Runs offline, the Vpc.from_lookup calls are answered by the committed cdk.context.json.
+Usage: python3 synth-benchmark/run.py [--accounts 24] [--write-context]
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCHMARK_DIR)
+CONTEXT_FILE = os.path.join(BENCHMARK_DIR, "cdk.context.json")
+
+sys.path.insert(0, APP_DIR)
+
+from aws_cdk import App
+from ruamel.yaml import YAML
+
+import app
+from infra_cdk_code.config_model import parse_config
+
+REGION = "eu-central-1"
+SERVICE_ACCOUNT_ID = "100000000000"
+
+
+def account_id(index: int) -> str:
+    return f"{200000000000 + index}"
+
+
+def vpc_id(index: int) -> str:
+    return f"vpc-{index:08x}"
+
+
+def generate_config(accounts: int) -> dict:
+    """
+    Fill the placeholders of config.yaml and copy its account for every generated account
+    :return: dict with the same layout as config.yaml
+    """
+    with open(os.path.join(APP_DIR, "config.yaml")) as config_file:
+        config = YAML(typ="safe").load(config_file)
+
+    template = config['aws_vars'].pop('account_1')
+    template.update(region=REGION, regions=[])
+    template['service_account'].update(
+        accountId=SERVICE_ACCOUNT_ID,
+        region=REGION,
+        crossAccountRole=f"arn:aws:iam::{SERVICE_ACCOUNT_ID}:role/cross-account"
+    )
+    template['project']['client'] = "benchmark"
+
+    for index in range(accounts):
+        acc = copy.deepcopy(template)
+        acc['accountId'] = account_id(index)
+        acc['resources']['vpcId'] = vpc_id(index)
+        # The event rule stacks of all accounts live in the one service account, the short name keeps them apart
+        acc['project']['shortName'] = f"ghostapp{index + 1:02d}"
+        config['aws_vars'][f"account_{index + 1}"] = acc
+
+    fe = config['frontend-ghost-app']['parameters']
+    fe['code'].update(
+        sourceRepo="ghost-app",
+        sourceBranch="main",
+        buildspec_path=".buildspec/buildspec.yml",
+        ecr_name="ghost",
+        base_image_repository_arn=f"arn:aws:ecr:{REGION}:{SERVICE_ACCOUNT_ID}:repository/ghost",
+        buildspec_bucket_arn="arn:aws:s3:::benchmark-buildspec"
+    )
+    fe['code']['cache_warmer']['site_url'] = "https://blog.example.com"
+    fe['ecs'].update(
+        cluster_name="ghost",
+        td_cpu=1024,
+        td_memory=2048,
+        container_cpu=512,
+        container_memory=1024,
+        host_port=2368,
+        container_port=2368
+    )
+    fe['media']['asset_host'] = "https://blog.example.com"
+    fe['lb'].update(targer_port=443, certificate_arn=f"arn:aws:acm:{REGION}:{SERVICE_ACCOUNT_ID}:certificate/benchmark")
+    fe['dns'].update(hosted_zone_id="Z0000000BENCHMARK", zone_name="example.com", record_name="blog")
+    # The cdn and the Route 53 health checks of the dns block reach the load balancer from the internet
+    fe['lb']['internet_facing'] = True
+    fe['cdn']['origin_domain'] = "origin.blog.example.com"
+    return config
+
+
+def vpc_context(index: int) -> dict:
+    # Three public and three private subnets, one per availability zone
+    subnet_groups = []
+    for group, offset in (("Public", 0), ("Private", 10)):
+        subnet_groups.append({
+            "name": group,
+            "type": group,
+            "subnets": [
+                {
+                    "subnetId": f"subnet-{index:08x}{offset + zone:02d}",
+                    "cidr": f"10.0.{offset + zone}.0/24",
+                    "availabilityZone": f"{REGION}{letter}",
+                    "routeTableId": f"rtb-{index:08x}{offset + zone:02d}"
+                } for zone, letter in enumerate("abc")
+            ]
+        })
+    return {
+        "vpcId": vpc_id(index),
+        "vpcCidrBlock": "10.0.0.0/16",
+        "ownerAccountId": account_id(index),
+        "availabilityZones": [],
+        "subnetGroups": subnet_groups
+    }
+
+
+def write_context(accounts: int) -> None:
+    context = {
+        f"vpc-provider:account={account_id(index)}:filter.isDefault=false:filter.vpc-id={vpc_id(index)}:"
+        f"region={REGION}:returnAsymmetricSubnets=true": vpc_context(index)
+        for index in range(accounts)
+    }
+    with open(CONTEXT_FILE, "w") as context_file:
+        json.dump(context, context_file, indent=2)
+        context_file.write("\n")
+
+
+def timed_synth(config: dict, context: dict, **filters) -> dict:
+    with tempfile.TemporaryDirectory() as outdir:
+        start = time.perf_counter()
+        main_app = app.init_app(App(context=dict(context, **filters), outdir=outdir), config=config)
+        built = time.perf_counter()
+        assembly = main_app.synth()
+        done = time.perf_counter()
+
+        missing = json.load(open(os.path.join(assembly.directory, "manifest.json"))).get("missing")
+        if missing:
+            raise RuntimeError(f"Context lookups missing from {CONTEXT_FILE}: {[item['key'] for item in missing]}")
+
+    return {
+        "filters": filters,
+        "stacks": len(assembly.stacks),
+        "construct_seconds": round(built - start, 2),
+        "synth_seconds": round(done - built, 2),
+        "total_seconds": round(done - start, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=24, help="Number of generated accounts")
+    parser.add_argument("--write-context", action="store_true", help="Regenerate cdk.context.json for --accounts")
+    args = parser.parse_args()
+
+    if args.write_context:
+        write_context(args.accounts)
+
+    with open(CONTEXT_FILE) as context_file:
+        context = json.load(context_file)
+
+    # app.py is built relative to its own folder, e.g. the Lambda and Fluent Bit assets
+    os.chdir(APP_DIR)
+
+    config = generate_config(args.accounts)
+    start = time.perf_counter()
+    parse_config(config)
+    parse_seconds = round(time.perf_counter() - start, 3)
+
+    # The first synth also starts the jsii runtime, it is left out of the results
+    timed_synth(config, context, account="account_1", stacks="events")
+
+    results = {
+        "accounts": args.accounts,
+        "parse_config_seconds": parse_seconds,
+        "runs": [
+            timed_synth(config, context, account="account_1", stacks="infra"),
+            timed_synth(config, context, account="account_1"),
+            timed_synth(config, context)
+        ]
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
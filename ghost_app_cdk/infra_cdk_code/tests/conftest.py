@@ -0,0 +1,134 @@
+import os
+
+import boto3
+import pytest
+from aws_cdk import App
+from aws_cdk.assertions import Template
+from ruamel.yaml import YAML
+
+from infra_cdk_code.config_model import parse_config
+from infra_cdk_code.infra_cdk_code_stack import CdkCodeStack
+from infra_cdk_code.fe_build_deploy import FeBuildDeploy
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+ACCOUNT_ID = "111111111111"
+SERVICE_ACCOUNT_ID = "222222222222"
+REGION = "eu-central-1"
+VPC_ID = "vpc-123"
+
+
+def vpc_context(region: str, vpc_id: str) -> dict:
+    """
+    Answer of the VPC lookup, so the stacks synthesize without AWS credentials
+    :return: dict with the context key and value of the lookup
+    """
+    subnet_groups = [
+        {
+            "name": group,
+            "type": group,
+            "subnets": [
+                {
+                    "subnetId": f"subnet-{offset + index}",
+                    "cidr": f"10.0.{offset + index}.0/24",
+                    "availabilityZone": f"{region}{zone}",
+                    "routeTableId": f"rtb-{offset + index}"
+                } for index, zone in enumerate(["a", "b", "c"])
+            ]
+        } for group, offset in [("Public", 10), ("Private", 20)]
+    ]
+    key = f"vpc-provider:account={ACCOUNT_ID}:filter.isDefault=false:filter.vpc-id={vpc_id}:region={region}:returnAsymmetricSubnets=true"
+    return {key: {"vpcId": vpc_id, "vpcCidrBlock": "10.0.0.0/16", "ownerAccountId": ACCOUNT_ID,
+                  "availabilityZones": [], "subnetGroups": subnet_groups}}
+
+
+def new_app(*regions: tuple) -> App:
+    context = vpc_context(REGION, VPC_ID)
+    for region, vpc_id in regions:
+        context.update(vpc_context(region, vpc_id))
+    return App(context=context)
+
+
+def aws_client(service_name: str, region: str = REGION):
+    """Client with fake credentials for a botocore Stubber, it never reaches AWS"""
+    return boto3.client(service_name, region_name=region, aws_access_key_id="test", aws_secret_access_key="test")
+
+
+class StubbedSession:
+    """Stands in for boto3.Session and hands out the stubbed clients by service name"""
+
+    def __init__(self, clients: dict):
+        self.clients = clients
+
+    def client(self, service_name: str, region_name: str = None):
+        return self.clients[service_name]
+
+
+class Capture:
+    """Matches any parameter of a stubbed call and keeps it"""
+
+    def __eq__(self, other):
+        self.value = other
+        return True
+
+
+def enable_blue_green(fe: dict) -> None:
+    """Switch an app to CodeDeploy blue/green deployments, which need lb mode alb"""
+    fe['lb']['mode'] = "alb"
+    fe['ecs']['deployment']['blue_green'] = {
+        "traffic_routing": "canary",
+        "step_percentage": 10,
+        "bake_minutes": 10,
+        "test_listener_port": 8443,
+        "termination_wait": 15,
+        "rollback_alarms": {"response_time_p95": 1, "response_time_p99": 2.5, "error_rate_5xx": 1, "evaluation_periods": 2}
+    }
+
+
+@pytest.fixture
+def config() -> dict:
+    """
+    config.yaml with test values in the settings that are left empty for the user
+    :return: dict with the configuration items
+    """
+    with open(os.path.join(APP_DIR, "config.yaml")) as config_file:
+        config = YAML().load(config_file)
+
+    acc = next(iter(config['aws_vars'].values()))
+    acc.update(region=REGION, accountId=ACCOUNT_ID, project={"shortName": "ghostapp", "client": "acme"})
+    acc['resources']['vpcId'] = VPC_ID
+    acc['service_account'].update(accountId=SERVICE_ACCOUNT_ID, region=REGION,
+                                  crossAccountRole=f"arn:aws:iam::{SERVICE_ACCOUNT_ID}:role/crossaccount")
+
+    fe = next(iter(config['frontend-ghost-app'].values()))
+    fe['code'].update(sourceRepo="ghost-site", sourceBranch="main", buildspec_path="buildspec.yml",
+                      base_image_repository_arn=f"arn:aws:ecr:{REGION}:{ACCOUNT_ID}:repository/ghost",
+                      buildspec_bucket_arn="arn:aws:s3:::buildspec")
+    fe['code']['cache_warmer']['site_url'] = "https://blog.example.com"
+    fe['ecs'].update(cluster_name="ghost", td_cpu=1024, td_memory=2048, container_cpu=512, container_memory=1024,
+                     host_port=2368, container_port=2368)
+    fe['lb'].update(targer_port=443, certificate_arn=f"arn:aws:acm:{REGION}:{ACCOUNT_ID}:certificate/site")
+    fe['cdn']['origin_domain'] = "origin.blog.example.com"
+    fe['dns'].update(hosted_zone_id="Z123", zone_name="example.com", record_name="blog")
+    fe['media']['asset_host'] = "https://blog.example.com"
+    return config
+
+
+@pytest.fixture
+def infra_template():
+    def synth(config: dict) -> Template:
+        deployment = parse_config(config)[0]
+        stack = CdkCodeStack(new_app(), deployment.infra_stack_id,
+                             env={'account': ACCOUNT_ID, 'region': REGION}, config=deployment.config)
+        return Template.from_stack(stack)
+    return synth
+
+
+@pytest.fixture
+def pipeline_template():
+    def synth(config: dict) -> Template:
+        deployment = parse_config(config)[0]
+        stack = FeBuildDeploy(new_app(), deployment.pipeline_stack_id,
+                              env={'account': ACCOUNT_ID, 'region': REGION}, config=deployment.config)
+        return Template.from_stack(stack)
+    return synth
@@ -0,0 +1,144 @@
+from aws_cdk.assertions import Match
+
+from tests.conftest import enable_blue_green
+
+
+def autoscaling(config: dict) -> dict:
+    return next(iter(config['frontend-ghost-app'].values()))['ecs']['autoscaling']
+
+
+def test_scalable_target_follows_the_config(config, infra_template):
+    template = infra_template(config)
+
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalableTarget", 1)
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalableTarget", {
+        "ServiceNamespace": "ecs",
+        "ScalableDimension": "ecs:service:DesiredCount",
+        "MinCapacity": autoscaling(config)['min_capacity'],
+        "MaxCapacity": autoscaling(config)['max_capacity']
+    })
+
+
+def test_scaled_service_has_no_desired_count(config, infra_template):
+    template = infra_template(config)
+
+    template.has_resource_properties("AWS::ECS::Service", {
+        "DesiredCount": Match.absent()
+    })
+
+
+def test_service_without_autoscaling_runs_no_tasks(config, infra_template):
+    next(iter(config['frontend-ghost-app'].values()))['ecs'].pop('autoscaling')
+    template = infra_template(config)
+
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalableTarget", 0)
+    template.has_resource_properties("AWS::ECS::Service", {
+        "DesiredCount": 0
+    })
+
+
+def test_target_tracking_policies_and_cooldowns(config, infra_template):
+    template = infra_template(config)
+    settings = autoscaling(config)
+
+    for metric_type, target in [("ECSServiceAverageCPUUtilization", settings['cpu_target']),
+                                ("ECSServiceAverageMemoryUtilization", settings['memory_target'])]:
+        template.has_resource_properties("AWS::ApplicationAutoScaling::ScalingPolicy", {
+            "PolicyType": "TargetTrackingScaling",
+            "TargetTrackingScalingPolicyConfiguration": {
+                "PredefinedMetricSpecification": {"PredefinedMetricType": metric_type},
+                "TargetValue": target,
+                "ScaleInCooldown": settings['scale_in_cooldown'],
+                "ScaleOutCooldown": settings['scale_out_cooldown']
+            }
+        })
+
+
+def test_nlb_flows_per_task_policy(config, infra_template):
+    template = infra_template(config)
+    settings = autoscaling(config)
+
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalingPolicy", {
+        "PolicyType": "TargetTrackingScaling",
+        "TargetTrackingScalingPolicyConfiguration": {
+            "TargetValue": settings['flows_per_task_target'],
+            "ScaleInCooldown": settings['scale_in_cooldown'],
+            "ScaleOutCooldown": settings['scale_out_cooldown'],
+            "CustomizedMetricSpecification": {
+                "Metrics": Match.array_with([
+                    Match.object_like({"Id": "hosts", "Expression": "FILL(healthyhosts, 0)", "ReturnData": False}),
+                    Match.object_like({"Id": "flowspertask", "Expression": "flows / IF(hosts > 0, hosts, 1)",
+                                       "ReturnData": True})
+                ])
+            }
+        }
+    })
+
+
+def test_alb_requests_per_task_policy(config, infra_template):
+    fe = next(iter(config['frontend-ghost-app'].values()))
+    fe['lb']['mode'] = "alb"
+    template = infra_template(config)
+
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalingPolicy", {
+        "PolicyType": "TargetTrackingScaling",
+        "TargetTrackingScalingPolicyConfiguration": {
+            "PredefinedMetricSpecification": {"PredefinedMetricType": "ALBRequestCountPerTarget"},
+            "TargetValue": fe['ecs']['autoscaling']['requests_per_task_target']
+        }
+    })
+
+
+def test_step_scaling_policy(config, infra_template):
+    template = infra_template(config)
+    step_scaling = autoscaling(config)['step_scaling']
+
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalingPolicy", {
+        "PolicyType": "StepScaling",
+        "StepScalingPolicyConfiguration": {
+            "AdjustmentType": "ChangeInCapacity",
+            "Cooldown": step_scaling['cooldown'],
+            "StepAdjustments": Match.array_with([
+                Match.object_like({"ScalingAdjustment": step['change']}) for step in step_scaling['steps']
+            ])
+        }
+    })
+
+
+def test_scheduled_actions(config, infra_template):
+    template = infra_template(config)
+    schedules = autoscaling(config)['schedules']
+
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalableTarget", {
+        "ScheduledActions": [
+            {
+                "ScheduledActionName": schedule['name'],
+                "Schedule": schedule['expression'],
+                "ScalableTargetAction": {
+                    "MinCapacity": schedule['min_capacity'],
+                    "MaxCapacity": schedule['max_capacity']
+                }
+            } for schedule in schedules
+        ]
+    })
+
+
+def test_blue_green_requests_per_task_policy(config, infra_template):
+    fe = next(iter(config['frontend-ghost-app'].values()))
+    enable_blue_green(fe)
+    template = infra_template(config)
+
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalingPolicy", {
+        "PolicyType": "TargetTrackingScaling",
+        "TargetTrackingScalingPolicyConfiguration": {
+            "TargetValue": fe['ecs']['autoscaling']['requests_per_task_target'],
+            "CustomizedMetricSpecification": {
+                "Metrics": Match.array_with([
+                    Match.object_like({"Id": "hosts", "Expression": "FILL(bluehosts, 0) + FILL(greenhosts, 0)",
+                                       "ReturnData": False}),
+                    Match.object_like({"Id": "requestspertask", "Expression": "requests / IF(hosts > 0, hosts, 1)",
+                                       "ReturnData": True})
+                ])
+            }
+        }
+    })
@@ -0,0 +1,83 @@
+import copy
+import importlib.util
+import json
+import os
+
+import pytest
+
+from tests.conftest import APP_DIR
+
+BENCHMARK_DIR = os.path.join(APP_DIR, "..", "benchmark")
+
+
+@pytest.fixture(scope="module")
+def benchmark():
+    spec = importlib.util.spec_from_file_location("benchmark_run", os.path.join(BENCHMARK_DIR, "run.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def thresholds():
+    with open(os.path.join(BENCHMARK_DIR, "thresholds.json")) as thresholds_file:
+        return json.load(thresholds_file)
+
+
+@pytest.fixture
+def baseline(benchmark):
+    return {
+        "settings": {"ghost_cpus": "0.5", "ghost_memory": "1g"},
+        "scenarios": {
+            scenario: {"throughput": 100.0, "latency_p50": 20.0, "latency_p95": 50.0, "latency_p99": 80.0,
+                       "error_rate": 0.0}
+            for scenario in benchmark.SCENARIOS
+        },
+        "container": {"cpu_avg": 40.0, "rss_max_mib": 300.0}
+    }
+
+
+def test_unchanged_result_passes(benchmark, baseline, thresholds):
+    assert benchmark.compare(copy.deepcopy(baseline), baseline, thresholds) == []
+
+
+def test_lower_throughput_regresses(benchmark, baseline, thresholds):
+    result = copy.deepcopy(baseline)
+    result["scenarios"]["post"]["throughput"] = 100.0 * (1 - (thresholds["throughput"] + 1) / 100)
+
+    assert [regression.split(":")[0] for regression in benchmark.compare(result, baseline, thresholds)] == \
+        ["post throughput"]
+
+
+def test_higher_throughput_is_not_a_regression(benchmark, baseline, thresholds):
+    result = copy.deepcopy(baseline)
+    result["scenarios"]["post"]["throughput"] = 200.0
+
+    assert benchmark.compare(result, baseline, thresholds) == []
+
+
+def test_latency_and_container_growth_above_the_thresholds_regresses(benchmark, baseline, thresholds):
+    result = copy.deepcopy(baseline)
+    result["scenarios"]["home"]["latency_p95"] = 50.0 * (1 + (thresholds["latency_p95"] + 1) / 100)
+    result["scenarios"]["tag"]["latency_p99"] = 80.0 * (1 + (thresholds["latency_p99"] - 1) / 100)
+    result["container"]["rss_max_mib"] = 300.0 * (1 + (thresholds["rss_max_mib"] + 1) / 100)
+
+    regressions = benchmark.compare(result, baseline, thresholds)
+
+    assert [regression.split(":")[0] for regression in regressions] == ["home latency_p95", "container rss_max_mib"]
+
+
+def test_zero_base_values_are_skipped(benchmark, baseline, thresholds):
+    baseline["scenarios"]["image"]["latency_p50"] = 0
+    result = copy.deepcopy(baseline)
+    result["scenarios"]["image"]["latency_p50"] = 500.0
+
+    assert benchmark.compare(result, baseline, thresholds) == []
+
+
+def test_error_rate_is_checked_without_a_baseline(benchmark, baseline, thresholds):
+    result = copy.deepcopy(baseline)
+    result["scenarios"]["admin_api"]["error_rate"] = thresholds["max_error_rate"] * 2
+
+    assert benchmark.compare(result, None, thresholds) == [f"admin_api error_rate: {thresholds['max_error_rate'] * 2}"]
+    assert benchmark.compare(copy.deepcopy(baseline), None, thresholds) == []
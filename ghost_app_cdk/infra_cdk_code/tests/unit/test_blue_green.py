@@ -0,0 +1,35 @@
+from aws_cdk.assertions import Match
+
+from tests.conftest import enable_blue_green
+
+
+def test_elb_5xx_alarm_rolls_back_the_deployment(config, infra_template):
+    fe = next(iter(config['frontend-ghost-app'].values()))
+    enable_blue_green(fe)
+    template = infra_template(config)
+
+    alarms = template.find_resources("AWS::CloudWatch::Alarm", {"Properties": {
+        "Threshold": fe['ecs']['deployment']['blue_green']['rollback_alarms']['error_rate_5xx'],
+        "Metrics": Match.array_with([Match.object_like({"MetricStat": Match.object_like({"Metric": Match.object_like({
+            "MetricName": "HTTPCode_ELB_5XX_Count",
+            "Dimensions": [Match.object_like({"Name": "LoadBalancer"})]
+        })})})])
+    }})
+    assert len(alarms) == 1
+    alarm_id = next(iter(alarms))
+
+    template.has_resource_properties("AWS::CodeDeploy::DeploymentGroup", {
+        "AlarmConfiguration": {
+            "Enabled": True,
+            "Alarms": Match.array_with([{"Name": {"Ref": alarm_id}}])
+        }
+    })
+
+
+def test_every_rollback_alarm_is_attached(config, infra_template):
+    enable_blue_green(next(iter(config['frontend-ghost-app'].values())))
+    template = infra_template(config)
+
+    # p95 and p99 latency and the target 5xx rate of both target groups, the ELB 5xx rate of the load balancer
+    deployment_group = next(iter(template.find_resources("AWS::CodeDeploy::DeploymentGroup").values()))
+    assert len(deployment_group['Properties']['AlarmConfiguration']['Alarms']) == 7
@@ -0,0 +1,28 @@
+import pytest
+
+
+def test_distribution_uses_the_origin_domain(config, infra_template):
+    template = infra_template(config)
+
+    origins = [
+        origin['DomainName']
+        for distribution in template.find_resources("AWS::CloudFront::Distribution").values()
+        for origin in distribution['Properties']['DistributionConfig']['Origins']
+    ]
+    assert "origin.blog.example.com" in origins
+
+
+def test_cdn_needs_an_origin_domain(config, infra_template):
+    next(iter(config['frontend-ghost-app'].values()))['cdn']['origin_domain'] = None
+
+    with pytest.raises(RuntimeError, match="origin_domain"):
+        infra_template(config)
+
+
+def test_cdn_needs_an_internet_facing_load_balancer(config, infra_template):
+    fe = next(iter(config['frontend-ghost-app'].values()))
+    fe.pop('dns')
+    fe['lb']['internet_facing'] = False
+
+    with pytest.raises(RuntimeError, match="cdn of .* internet facing load balancer"):
+        infra_template(config)
@@ -0,0 +1,21 @@
+import pytest
+
+from infra_cdk_code.config_model import parse_config, select
+
+
+def test_every_stack_gets_its_own_config(config):
+    deployment = parse_config(config)[0]
+    first = deployment.config
+    first['fe']['ecs']['service_name'] = "changed"
+
+    assert deployment.config['fe']['ecs'].get('service_name') is None
+    assert deployment.fe['ecs'].get('service_name') is None
+
+
+def test_select_defaults_to_the_first_entry(config):
+    assert select(config['aws_vars'], None, "accounts") == next(iter(config['aws_vars'].items()))
+
+
+def test_select_rejects_an_unknown_key(config):
+    with pytest.raises(SystemExit, match="account_9 is not one of the accounts"):
+        select(config['aws_vars'], "account_9", "accounts")
@@ -0,0 +1,33 @@
+import pytest
+from aws_cdk import App, Aspects, Stack, aws_codebuild as codebuild, aws_codecommit as codecommit
+from aws_cdk.assertions import Annotations, Match
+
+from infra_cdk_code.performance_policy import PerformancePolicy
+from tests.conftest import APP_DIR
+
+
+def test_buildspec_files_are_read_relative_to_the_config(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+
+    policy = PerformancePolicy({'buildspec_files': ["../.buildspec/buildspec.yml"]}, APP_DIR)
+
+    assert "phases:" in policy.buildspec_files["../.buildspec/buildspec.yml"]
+
+
+def test_missing_buildspec_file_fails(tmp_path):
+    with pytest.raises(RuntimeError, match="buildspec_files: buildspec.yml does not exist"):
+        PerformancePolicy({'buildspec_files': ["buildspec.yml"]}, f"{tmp_path}")
+
+
+def test_no_cache_in_a_buildspec_file_is_reported(tmp_path):
+    (tmp_path / "buildspec.yml").write_text("phases:\n  build:\n    commands:\n      - docker build --no-cache .\n")
+    app = App()
+    stack = Stack(app, "pipeline")
+    repository = codecommit.Repository.from_repository_name(stack, "repository", "ghost-site")
+    codebuild.Project(stack, "project", source=codebuild.Source.code_commit(repository=repository),
+                      build_spec=codebuild.BuildSpec.from_source_filename("buildspec.yml"),
+                      cache=codebuild.Cache.local(codebuild.LocalCacheMode.SOURCE))
+
+    Aspects.of(app).add(PerformancePolicy({'buildspec_files': ["buildspec.yml"]}, f"{tmp_path}"))
+
+    Annotations.from_stack(stack).has_warning("/pipeline/project/Resource", Match.string_like_regexp(r"\[buildspec-no-cache\].*\(buildspec.yml\)"))
@@ -0,0 +1,47 @@
+import json
+
+
+def without_trigger_paths(config: dict) -> dict:
+    next(iter(config['frontend-ghost-app'].values()))['code'].pop('trigger_paths')
+    return config
+
+
+def rule_targets(template) -> list:
+    return [
+        json.dumps(target['Arn'])
+        for rule in template.find_resources("AWS::Events::Rule").values()
+        for target in rule['Properties']['Targets']
+    ]
+
+
+def test_source_action_does_not_trigger_the_pipeline(config, pipeline_template):
+    template = pipeline_template(config)
+
+    pipeline = next(iter(template.find_resources("AWS::CodePipeline::Pipeline").values()))
+    source_action = pipeline['Properties']['Stages'][0]['Actions'][0]
+    assert source_action['ActionTypeId']['Provider'] == "CodeCommit"
+    assert source_action['Configuration']['PollForSourceChanges'] is False
+
+
+def test_one_rule_starts_the_pipeline(config, pipeline_template):
+    template = pipeline_template(without_trigger_paths(config))
+
+    pipeline_id = next(iter(template.find_resources("AWS::CodePipeline::Pipeline")))
+    targets = rule_targets(template)
+    assert len([target for target in targets if pipeline_id in target]) == 1
+    assert len(targets) == 1
+
+
+def test_trigger_paths_start_the_pipeline_through_the_function(config, pipeline_template):
+    template = pipeline_template(config)
+
+    pipeline_id = next(iter(template.find_resources("AWS::CodePipeline::Pipeline")))
+    function_id = next(
+        logical_id for logical_id, function in template.find_resources("AWS::Lambda::Function").items()
+        if function['Properties']['Handler'] == "index.handler"
+        and "INCLUDE_PATHS" in function['Properties']['Environment']['Variables']
+    )
+    targets = rule_targets(template)
+    assert len(targets) == 1
+    assert function_id in targets[0]
+    assert not any(pipeline_id in target for target in targets)
@@ -0,0 +1,85 @@
+import importlib.util
+import os
+
+import pytest
+
+from tests.conftest import APP_DIR
+
+
+@pytest.fixture
+def trigger(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "eu-central-1")
+    monkeypatch.setenv("PIPELINE_NAME", "pipeline-frontend-ghost-app")
+    monkeypatch.setenv("REPOSITORY_NAME", "ghost-site")
+    monkeypatch.setenv("SOURCE_ROLE_ARN", "arn:aws:iam::222222222222:role/crossaccount")
+    monkeypatch.setenv("INCLUDE_PATHS", '["*"]')
+    monkeypatch.setenv("EXCLUDE_PATHS", '["*.md", "docs/*", "ghost_app_cdk/infra_cdk_code/*"]')
+
+    spec = importlib.util.spec_from_file_location("pipeline_trigger", os.path.join(APP_DIR, "pipeline-trigger", "index.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeCodePipeline:
+    def __init__(self):
+        self.started = []
+
+    def start_pipeline_execution(self, name):
+        self.started.append(name)
+        return {"pipelineExecutionId": "execution-1"}
+
+
+def push_event(old_commit_id="1111111", commit_id="2222222") -> dict:
+    return {"detail": {"oldCommitId": old_commit_id, "commitId": commit_id}}
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("ghost_app_cdk/my-ghost-app/Dockerfile", True),
+    ("ghost_app_cdk/.buildspec/buildspec.yml", True),
+    ("README.md", False),
+    ("ghost_app_cdk/infra_cdk_code/README.md", False),
+    ("docs/architecture.png", False),
+    ("ghost_app_cdk/infra_cdk_code/infra_cdk_code/fe_build_deploy.py", False),
+])
+def test_default_trigger_paths(trigger, path, expected):
+    assert trigger.triggers_build(path) is expected
+
+
+def test_include_limits_the_paths(trigger, monkeypatch):
+    monkeypatch.setattr(trigger, "INCLUDE_PATHS", ["ghost_app_cdk/my-ghost-app/*"])
+    monkeypatch.setattr(trigger, "EXCLUDE_PATHS", [])
+
+    assert trigger.triggers_build("ghost_app_cdk/my-ghost-app/Dockerfile")
+    assert not trigger.triggers_build("ghost_app_cdk/benchmark/run.py")
+
+
+def test_push_of_excluded_paths_is_skipped(trigger, monkeypatch):
+    codepipeline = FakeCodePipeline()
+    monkeypatch.setattr(trigger, "codepipeline", codepipeline)
+    monkeypatch.setattr(trigger, "changed_paths", lambda old, new: iter(["README.md", "docs/setup.md"]))
+
+    trigger.handler(push_event(), None)
+
+    assert codepipeline.started == []
+
+
+def test_push_of_app_code_starts_the_pipeline_once(trigger, monkeypatch):
+    codepipeline = FakeCodePipeline()
+    monkeypatch.setattr(trigger, "codepipeline", codepipeline)
+    monkeypatch.setattr(trigger, "changed_paths",
+                        lambda old, new: iter(["README.md", "ghost_app_cdk/my-ghost-app/Dockerfile", "package.json"]))
+
+    trigger.handler(push_event(), None)
+
+    assert codepipeline.started == ["pipeline-frontend-ghost-app"]
+
+
+def test_new_branch_is_always_built(trigger, monkeypatch):
+    codepipeline = FakeCodePipeline()
+    monkeypatch.setattr(trigger, "codepipeline", codepipeline)
+    monkeypatch.setattr(trigger, "changed_paths", lambda old, new: pytest.fail("a new branch has nothing to compare"))
+
+    trigger.handler(push_event(old_commit_id=None), None)
+
+    assert codepipeline.started == ["pipeline-frontend-ghost-app"]
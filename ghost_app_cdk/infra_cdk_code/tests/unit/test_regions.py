@@ -0,0 +1,54 @@
+import pytest
+from aws_cdk.assertions import Match
+
+from infra_cdk_code.config_model import parse_config
+
+
+def add_region(config: dict) -> None:
+    next(iter(config['aws_vars'].values()))['regions'] = [
+        {"region": "us-east-1", "vpcId": "vpc-456", "certificate_arn": "arn:aws:acm:us-east-1:111111111111:certificate/site"}
+    ]
+
+
+def test_regions_cannot_share_a_database(config):
+    add_region(config)
+
+    with pytest.raises(RuntimeError, match="regions cannot be combined with .*database"):
+        parse_config(config)
+
+
+def test_regions_cannot_share_the_media_bucket(config):
+    add_region(config)
+    next(iter(config['frontend-ghost-app'].values())).pop('database')
+
+    with pytest.raises(RuntimeError, match="regions cannot be combined with .*media"):
+        parse_config(config)
+
+
+def test_regions_without_database_and_media_are_valid(config):
+    add_region(config)
+    fe = next(iter(config['frontend-ghost-app'].values()))
+    fe.pop('database')
+    fe.pop('media')
+
+    assert len(parse_config(config)) == 1
+
+
+def test_main_service_keeps_its_generated_name(config, infra_template):
+    template = infra_template(config)
+
+    template.has_resource_properties("AWS::ECS::Service", {
+        "ServiceName": Match.absent()
+    })
+    template.has_resource_properties("AWS::SSM::Parameter", {
+        "Name": "dev.ecs-service-name.frontend-ghost-app",
+        "Value": {"Fn::GetAtt": [Match.string_like_regexp("^fs"), "Name"]}
+    })
+
+
+
+def test_dns_needs_an_internet_facing_load_balancer(config, infra_template):
+    next(iter(config['frontend-ghost-app'].values()))['lb']['internet_facing'] = False
+
+    with pytest.raises(RuntimeError, match="dns records of .* need an internet facing"):
+        infra_template(config)
@@ -0,0 +1,101 @@
+import os
+
+import boto3
+import pytest
+from botocore.stub import ANY, Stubber
+from ruamel.yaml import YAML
+
+import right_size
+from tests.conftest import APP_DIR, Capture, StubbedSession, aws_client
+
+FIXTURE = os.path.join(APP_DIR, "right-sizing", "fixture.json")
+
+
+@pytest.fixture
+def args(monkeypatch):
+    monkeypatch.setattr("sys.argv", ["right_size.py"])
+    return right_size.parse_args()
+
+
+def app(config: dict) -> tuple:
+    return next(iter(config['frontend-ghost-app'].items()))
+
+
+def test_recommend_covers_the_fixture(config, args):
+    _, fe = app(config)
+    values = right_size.load_fixture(FIXTURE)
+
+    proposal = right_size.recommend(values, fe, args)
+
+    sidecar_cpu, sidecar_memory = right_size.sidecar_reservations(fe)
+    assert proposal['td_memory'] in right_size.FARGATE_SIZES[proposal['td_cpu']]
+    assert proposal['td_cpu'] >= right_size.percentile(values['cpu_max'], args.cpu_percentile) * 1.2
+    assert proposal['td_memory'] >= right_size.percentile(values['mem_max'], args.memory_percentile) * 1.2
+    assert proposal['container_cpu'] == proposal['td_cpu'] - sidecar_cpu >= right_size.MIN_CONTAINER_CPU
+    assert proposal['container_memory'] == proposal['td_memory'] - sidecar_memory >= right_size.MIN_CONTAINER_MEMORY
+    assert proposal['node_max_old_space_size'] % 32 == 0
+    assert proposal['node_max_old_space_size'] <= proposal['container_memory'] * args.heap_ratio / 100
+
+
+def test_recommend_picks_the_cheapest_size(config, args):
+    _, fe = app(config)
+    fe['nginx'] = None
+    fe['tracing'] = None
+    fe['logging']['driver'] = "awslogs"
+    values = {"cpu_max": [100.0] * 10, "mem_max": [500.0] * 10}
+
+    proposal = right_size.recommend(values, fe, args)
+
+    assert (proposal['td_cpu'], proposal['td_memory']) == (256, 1024)
+
+
+def test_config_diff_changes_only_the_values(config, args, tmp_path):
+    app_key, fe = app(config)
+    config_path = tmp_path / "config.yaml"
+    with open(config_path, "w") as config_file:
+        YAML().dump(config, config_file)
+    proposal = right_size.recommend(right_size.load_fixture(FIXTURE), fe, args)
+
+    diff = right_size.config_diff(f"{config_path}", app_key, proposal)
+
+    added = [line for line in diff.splitlines() if line.startswith("+") and not line.startswith("+++")]
+    assert len(added) == 4
+    assert f"+      container_memory: {proposal['container_memory']} # Container memory" in added
+    assert f"+      node_max_old_space_size: {proposal['node_max_old_space_size']} # MiB of V8 heap" in "\n".join(added)
+    assert right_size.config_diff(f"{config_path}", app_key, {}) == ""
+
+
+def test_fetch_metrics_divides_by_the_running_tasks(config, args, monkeypatch):
+    _, fe = app(config)
+    acc = next(iter(config['aws_vars'].values()))
+    ssm = aws_client("ssm")
+    cloudwatch = aws_client("cloudwatch")
+    monkeypatch.setattr(boto3, "Session", lambda **kwargs: StubbedSession({"ssm": ssm, "cloudwatch": cloudwatch}))
+
+    queries = Capture()
+    with Stubber(ssm) as ssm_stub, Stubber(cloudwatch) as cloudwatch_stub:
+        ssm_stub.add_response(
+            "get_parameter",
+            {"Parameter": {"Name": "dev.ecs-service-name.frontend-ghost-app", "Value": "frontend-ghost-app-fs-1A2B"}},
+            {"Name": "dev.ecs-service-name.frontend-ghost-app"}
+        )
+        cloudwatch_stub.add_response(
+            "get_metric_data",
+            {"MetricDataResults": [{"Id": query_id, "Values": [10.0, 20.0]} for query_id in right_size.METRIC_QUERIES]},
+            {"MetricDataQueries": queries, "StartTime": ANY, "EndTime": ANY}
+        )
+
+        values = right_size.fetch_metrics(acc, fe, args)
+
+    assert values == {query_id: [10.0, 20.0] for query_id in right_size.METRIC_QUERIES}
+    returned = {query['Id']: query for query in queries.value if query.get('ReturnData', True)}
+    assert sorted(returned) == sorted(right_size.METRIC_QUERIES)
+    assert returned['cpu_max']['Expression'] == "IF(tasks > 0, cpu_max_total / tasks)"
+    metrics = {query['Id']: query['MetricStat'] for query in queries.value if 'MetricStat' in query}
+    assert metrics['tasks']['Metric']['MetricName'] == "RunningTaskCount"
+    assert metrics['mem_max_total']['Metric']['MetricName'] == "MemoryUtilized"
+    assert metrics['mem_max_total']['Stat'] == "Maximum"
+    assert metrics['mem_max_total']['Metric']['Dimensions'] == [
+        {"Name": "ClusterName", "Value": fe['ecs']['cluster_name']},
+        {"Name": "ServiceName", "Value": "frontend-ghost-app-fs-1A2B"}
+    ]
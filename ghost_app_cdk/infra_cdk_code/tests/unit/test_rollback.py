@@ -0,0 +1,172 @@
+import argparse
+import datetime
+import json
+
+import boto3
+import pytest
+from botocore.stub import ANY, Stubber
+from ruamel.yaml import YAML
+
+import rollback
+from tests.conftest import ACCOUNT_ID, REGION, Capture, StubbedSession, aws_client, enable_blue_green
+
+SERVICE_NAME = "frontend-ghost-app-fs-1A2B"
+CLUSTER_ARN = f"arn:aws:ecs:{REGION}:{ACCOUNT_ID}:cluster/ghost"
+TASK_DEFINITION_ARN = f"arn:aws:ecs:{REGION}:{ACCOUNT_ID}:task-definition/frontend-ghost-app:7"
+NEW_TASK_DEFINITION_ARN = f"arn:aws:ecs:{REGION}:{ACCOUNT_ID}:task-definition/frontend-ghost-app:8"
+REPOSITORY = f"{ACCOUNT_ID}.dkr.ecr.{REGION}.amazonaws.com/frontend-ghost-app"
+
+# Newest first, the same order releases() returns
+RELEASES = [
+    {"tag": "commit-ccc", "digest": "sha256:ccc", "pushed_at": datetime.datetime(2024, 5, 3, tzinfo=datetime.timezone.utc)},
+    {"tag": "commit-bbb", "digest": "sha256:bbb", "pushed_at": datetime.datetime(2024, 5, 2, tzinfo=datetime.timezone.utc)},
+    {"tag": "commit-aaa", "digest": "sha256:aaa", "pushed_at": datetime.datetime(2024, 5, 1, tzinfo=datetime.timezone.utc)},
+]
+
+
+def pick_args(previous: bool = False, to: str = None) -> argparse.Namespace:
+    return argparse.Namespace(previous=previous, to=to, list=False)
+
+
+def task_definition(digest: str) -> dict:
+    return {
+        "taskDefinitionArn": TASK_DEFINITION_ARN,
+        "family": "frontend-ghost-app",
+        "revision": 7,
+        "status": "ACTIVE",
+        "compatibilities": ["EC2", "FARGATE"],
+        "requiresCompatibilities": ["FARGATE"],
+        "networkMode": "awsvpc",
+        "cpu": "1024",
+        "memory": "2048",
+        "registeredBy": f"arn:aws:iam::{ACCOUNT_ID}:role/pipeline",
+        "containerDefinitions": [
+            {"name": "frontend-ghost-app-container", "image": f"{REPOSITORY}@{digest}", "essential": True},
+            {"name": "frontend-ghost-app-nginx", "image": "public.ecr.aws/nginx/nginx:1.27-alpine", "essential": True}
+        ]
+    }
+
+
+def test_previous_is_the_release_before_the_running_one():
+    assert rollback.pick_release(RELEASES, "sha256:ccc", pick_args(previous=True))['tag'] == "commit-bbb"
+    assert rollback.pick_release(RELEASES, "sha256:bbb", pick_args(previous=True))['tag'] == "commit-aaa"
+
+
+def test_previous_skips_older_tags_of_the_running_image():
+    # A rebuild of the same commit pushes the same digest under another tag
+    found = RELEASES[:1] + [dict(RELEASES[1], digest="sha256:ccc")] + RELEASES[2:]
+
+    assert rollback.pick_release(found, "sha256:ccc", pick_args(previous=True))['tag'] == "commit-aaa"
+
+
+def test_previous_fails_without_an_older_release():
+    with pytest.raises(SystemExit, match="no release older"):
+        rollback.pick_release(RELEASES, "sha256:aaa", pick_args(previous=True))
+
+
+def test_previous_fails_when_the_running_image_is_not_a_release():
+    with pytest.raises(SystemExit, match="is not a release in ECR"):
+        rollback.pick_release(RELEASES, "sha256:fff", pick_args(previous=True))
+
+
+def test_to_picks_the_named_tag():
+    assert rollback.pick_release(RELEASES, "sha256:ccc", pick_args(to="commit-aaa"))['digest'] == "sha256:aaa"
+
+    with pytest.raises(SystemExit, match="commit-zzz is not in ECR"):
+        rollback.pick_release(RELEASES, "sha256:ccc", pick_args(to="commit-zzz"))
+
+
+def test_releases_are_the_commit_tags_newest_first():
+    ecr = aws_client("ecr")
+    with Stubber(ecr) as ecr_stub:
+        ecr_stub.add_response("describe_images", {"imageDetails": [
+            {"imageDigest": "sha256:aaa", "imageTags": ["commit-aaa"], "imagePushedAt": RELEASES[2]['pushed_at']},
+            {"imageDigest": "sha256:ccc", "imageTags": ["commit-ccc", "latest"], "imagePushedAt": RELEASES[0]['pushed_at']},
+            {"imageDigest": "sha256:bbb", "imageTags": ["commit-bbb"], "imagePushedAt": RELEASES[1]['pushed_at']}
+        ]}, {"repositoryName": "frontend-ghost-app", "filter": {"tagStatus": "TAGGED"}})
+
+        assert [release['tag'] for release in rollback.releases(ecr, "frontend-ghost-app")] == \
+            ["commit-ccc", "commit-bbb", "commit-aaa"]
+
+
+def test_revision_only_changes_the_image_of_the_app_container():
+    ecs = aws_client("ecs")
+    tags = [{"key": "Project", "value": "ghostapp"}]
+    running = task_definition("sha256:ccc")
+    expected = task_definition("sha256:ccc")
+    for field in ["taskDefinitionArn", "revision", "status", "compatibilities", "registeredBy"]:
+        expected.pop(field)
+    expected['containerDefinitions'][0]['image'] = f"{REPOSITORY}@sha256:bbb"
+
+    with Stubber(ecs) as ecs_stub:
+        ecs_stub.add_response("register_task_definition", {"taskDefinition": {"taskDefinitionArn": NEW_TASK_DEFINITION_ARN}},
+                              dict(expected, tags=tags))
+
+        assert rollback.register_revision(ecs, running, tags, "frontend-ghost-app-container",
+                                          f"{REPOSITORY}@sha256:bbb") == NEW_TASK_DEFINITION_ARN
+
+
+def run_rollback(config: dict, tmp_path, monkeypatch, codedeploy_expected: dict = None) -> None:
+    """Run rollback.py --previous --no-wait against stubbed ssm, ecr, ecs and codedeploy clients"""
+    config_path = tmp_path / "config.yaml"
+    with open(config_path, "w") as config_file:
+        YAML().dump(config, config_file)
+    monkeypatch.setattr("sys.argv", ["rollback.py", "--config", f"{config_path}", "--previous", "--no-wait"])
+
+    clients = {name: aws_client(name) for name in ["ssm", "ecr", "ecs", "codedeploy"]}
+    monkeypatch.setattr(boto3, "Session", lambda **kwargs: StubbedSession(clients))
+    stubs = {name: Stubber(client) for name, client in clients.items()}
+
+    stubs['ssm'].add_response("get_parameter", {"Parameter": {"Value": SERVICE_NAME}},
+                              {"Name": "dev.ecs-service-name.frontend-ghost-app"})
+    stubs['ecr'].add_response("describe_images", {"imageDetails": [
+        {"imageDigest": release['digest'], "imageTags": [release['tag']], "imagePushedAt": release['pushed_at']}
+        for release in RELEASES
+    ]}, {"repositoryName": "frontend-ghost-app", "filter": {"tagStatus": "TAGGED"}})
+    stubs['ecs'].add_response("describe_services", {"services": [
+        {"serviceName": SERVICE_NAME, "status": "ACTIVE", "taskDefinition": TASK_DEFINITION_ARN}
+    ]}, {"cluster": "ghost", "services": [SERVICE_NAME]})
+    stubs['ecs'].add_response("describe_task_definition", {"taskDefinition": task_definition("sha256:ccc"), "tags": []},
+                              {"taskDefinition": TASK_DEFINITION_ARN, "include": ["TAGS"]})
+    revision = Capture()
+    stubs['ecs'].add_response("register_task_definition", {"taskDefinition": {"taskDefinitionArn": NEW_TASK_DEFINITION_ARN}},
+                              {"family": "frontend-ghost-app", "requiresCompatibilities": ANY, "networkMode": ANY,
+                               "cpu": ANY, "memory": ANY, "containerDefinitions": revision})
+    if codedeploy_expected:
+        stubs['codedeploy'].add_response("create_deployment", {"deploymentId": "d-ROLLBACK1"}, codedeploy_expected)
+    else:
+        stubs['ecs'].add_response("update_service", {"service": {"serviceName": SERVICE_NAME}},
+                                  {"cluster": "ghost", "service": SERVICE_NAME, "taskDefinition": NEW_TASK_DEFINITION_ARN})
+
+    for stub in stubs.values():
+        stub.activate()
+    rollback.main()
+    for stub in stubs.values():
+        stub.assert_no_pending_responses()
+
+    assert revision.value[0]['image'] == f"{REPOSITORY}@sha256:bbb"
+    assert revision.value[1]['image'] == "public.ecr.aws/nginx/nginx:1.27-alpine"
+
+
+def test_rolling_service_is_updated_in_place(config, tmp_path, monkeypatch):
+    run_rollback(config, tmp_path, monkeypatch)
+
+
+def test_blue_green_service_is_rolled_back_by_codedeploy(config, tmp_path, monkeypatch):
+    fe = next(iter(config['frontend-ghost-app'].values()))
+    enable_blue_green(fe)
+    deployment = Capture()
+
+    run_rollback(config, tmp_path, monkeypatch, {
+        "applicationName": "frontend-ghost-app",
+        "deploymentGroupName": "frontend-ghost-app",
+        "description": f"Rollback to {NEW_TASK_DEFINITION_ARN}",
+        "deploymentConfigName": "CodeDeployDefault.ECSAllAtOnce",
+        "revision": deployment
+    })
+
+    appspec = json.loads(deployment.value['appSpecContent']['content'])
+    properties = appspec['Resources'][0]['TargetService']['Properties']
+    assert properties['TaskDefinition'] == NEW_TASK_DEFINITION_ARN
+    assert properties['LoadBalancerInfo'] == {"ContainerName": "frontend-ghost-app-nginx",
+                                              "ContainerPort": fe['nginx']['port']}
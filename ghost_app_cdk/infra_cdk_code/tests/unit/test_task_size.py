@@ -0,0 +1,21 @@
+import pytest
+
+
+def test_sidecars_fit_in_the_task(config, infra_template):
+    template = infra_template(config)
+
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "Cpu": "1024",
+        "Memory": "2048"
+    })
+
+
+def test_sidecars_together_must_fit_in_the_task(config, infra_template):
+    fe = next(iter(config['frontend-ghost-app'].values()))
+    fe.pop('nginx')
+    fe['logging']['driver'] = "firelens"
+    # Either sidecar alone fits next to the Ghost container, the tracing collector and FireLens together do not
+    fe['ecs']['container_cpu'] = 1024 - fe['tracing']['collector_cpu'] - fe['logging']['firelens']['cpu'] + 1
+
+    with pytest.raises(RuntimeError, match="sidecars"):
+        infra_template(config)